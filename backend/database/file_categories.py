@@ -0,0 +1,56 @@
+# file_categories.py - Gemensam filtypsregistry för backend och indexerare
+#
+# Importeras av backend (files.category vid import och statistik) och av
+# indexerarna i scripts/ så att kategorierna alltid stämmer överens. Indexerarna
+# når modulen via symlänkarna scripts/file_categories.py och
+# scripts/gemini/file_categories.py. Modulen får bara använda standardbiblioteket.
+
+from typing import Dict, List, Tuple
+
+# Kategori -> filändelser (gemener, utan punkt). Ordningen avgör vid krockar.
+CATEGORY_EXTENSIONS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    # Bilder (inklusive RAW och VFX-format)
+    ('image', ('jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp', 'svg', 'heic',
+               'cr2', 'cr3', 'crw', 'nef', 'nrw', 'arw', 'srf', 'sr2', 'dng', 'iiq', '3fr',
+               'fff', 'orf', 'rw2', 'raf', 'pef', 'x3f', 'dpx', 'exr', 'hdr')),
+    # Video
+    ('video', ('mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm', 'm4v', 'mpg', 'mpeg',
+               'r3d', 'braw', 'mxf', 'prores', 'mts', 'm2ts', 'vob', 'ogv')),
+    # Audio
+    ('audio', ('mp3', 'wav', 'flac', 'aac', 'ogg', 'wma', 'aiff', 'aif', 'm4a',
+               'opus', 'mid', 'midi')),
+    # Dokument
+    ('document', ('pdf', 'doc', 'docx', 'txt', 'rtf', 'odt', 'pages', 'ai', 'eps', 'indd', 'psd',
+                  'xlsx', 'xls', 'ppt', 'pptx', 'key', 'numbers', 'csv', 'md')),
+    # Arkiv och diskavbilder
+    ('archive', ('zip', 'rar', '7z', 'tar', 'gz', 'bz2', 'xz', 'dmg', 'iso', 'img', 'vhd', 'vmdk')),
+    # Kod/Data
+    ('code', ('js', 'jsx', 'ts', 'tsx', 'html', 'css', 'json', 'xml', 'yml', 'yaml',
+              'py', 'java', 'cpp', 'c', 'h', 'sql', 'sh', 'bat', 'cmd', 'ps1', 'php',
+              'rb', 'go', 'rs', 'swift', 'kt')),
+    # Typsnitt
+    ('font', ('ttf', 'otf', 'woff', 'woff2')),
+    # 3D-modeller/CAD
+    ('3d_cad', ('obj', 'fbx', 'gltf', 'glb', 'stl', 'dwg', 'dxf')),
+)
+
+OTHER_CATEGORY = 'other'
+
+# Alla kategorier i visningsordning
+FILE_CATEGORIES: List[str] = [category for category, _ in CATEGORY_EXTENSIONS] + [OTHER_CATEGORY]
+
+# Filändelse -> kategori (första träffen vinner)
+EXTENSION_CATEGORY: Dict[str, str] = {}
+for _category, _extensions in CATEGORY_EXTENSIONS:
+    for _ext in _extensions:
+        EXTENSION_CATEGORY.setdefault(_ext, _category)
+
+
+def normalize_extension(extension: str) -> str:
+    """'.CR3' / 'CR3' -> 'cr3'"""
+    return (extension or '').strip().lower().lstrip('.')
+
+
+def determine_file_type(extension: str) -> str:
+    """Bestäm fil-kategori baserat på extension"""
+    return EXTENSION_CATEGORY.get(normalize_extension(extension), OTHER_CATEGORY)
@@ -0,0 +1,405 @@
+# migrations.py - Återupptagbar uppgradering av en befintlig katalog
+#
+# Stegen körs i ordning. Per-disk-steg tar en disk i taget i egna
+# transaktioner, så en avbruten körning fortsätter med nästa disk som inte är
+# klar. Om ett steg behövs avgörs av databasens tillstånd, inte av
+# markeringarna; schema_migrations visar bara vad som gjorts och hur lång tid
+# det tog. Index byggs med CREATE INDEX CONCURRENTLY, och files.size görs om
+# till BIGINT utan att tabellen skrivs om eller läses under lås. Appen kan
+# alltså vara igång under hela uppgraderingen.
+
+import re
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from . import db_manager as db
+
+# pg_advisory_lock som hindrar två körningar samtidigt
+MIGRATION_LOCK = 4802
+
+# Rader per transaktion när size kopieras till size_bigint
+SIZE_BATCH_ROWS = 50000
+
+
+class MigrationAlreadyRunning(Exception):
+    """En annan migreringskörning håller låset"""
+
+
+class Step:
+    """
+    Ett migreringssteg. needed/run tar (session) för globala steg och
+    (session, disk_id) för per-disk-steg. run returnerar antal ändrade rader.
+    """
+
+    def __init__(self, name: str, description: str, per_disk: bool,
+                 needed: Callable, run: Callable):
+        self.name = name
+        self.description = description
+        self.per_disk = per_disk
+        self.needed = needed
+        self.run = run
+
+
+# === files.size -> BIGINT ===
+#
+# ALTER COLUMN TYPE skriver om hela tabellen med exklusivt lås. I stället läggs
+# en BIGINT-kolumn till (bara metadata) tillsammans med en trigger som håller
+# den i synk för nya och ändrade rader. Befintliga värden kopieras disk för
+# disk i batchar, och indexen på size byggs som kopior på size_bigint med
+# CONCURRENTLY. Sist byts kolumnerna i en kort transaktion som bara tar bort
+# triggern och den gamla kolumnen och byter namn på kolumn och index.
+
+SIZE_SYNC_TRIGGER = "files_size_bigint_sync"
+
+
+def _size_is_integer(session) -> bool:
+    data_type = session.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'files' AND column_name = 'size'
+    """)).scalar()
+    return data_type == 'integer'
+
+
+def _has_size_bigint(session) -> bool:
+    return session.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = 'files'
+                         AND column_name = 'size_bigint')
+    """)).scalar()
+
+
+def _has_size_trigger(session) -> bool:
+    return session.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM pg_trigger
+                       WHERE tgrelid = 'files'::regclass AND tgname = :name)
+    """), {"name": SIZE_SYNC_TRIGGER}).scalar()
+
+
+def _ensure_size_bigint(session):
+    # ALTER och CREATE TRIGGER tar korta lås även när inget ändras - bara när något saknas
+    if not _has_size_bigint(session) or not _has_size_trigger(session):
+        session.execute(text("SET LOCAL lock_timeout = '10s'"))
+        session.execute(text("ALTER TABLE files ADD COLUMN IF NOT EXISTS size_bigint BIGINT"))
+        session.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {SIZE_SYNC_TRIGGER}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                NEW.size_bigint := NEW.size;
+                RETURN NEW;
+            END $$
+        """))
+        session.execute(text(f"DROP TRIGGER IF EXISTS {SIZE_SYNC_TRIGGER} ON files"))
+        session.execute(text(f"""
+            CREATE TRIGGER {SIZE_SYNC_TRIGGER} BEFORE INSERT OR UPDATE OF size ON files
+            FOR EACH ROW EXECUTE FUNCTION {SIZE_SYNC_TRIGGER}()
+        """))
+    session.commit()
+
+
+def _size_copy_needed(session, disk_id: int) -> bool:
+    if not _size_is_integer(session):
+        return False
+    if not _has_size_bigint(session) or not _has_size_trigger(session):
+        return True
+    return session.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM files WHERE disk_id = :disk_id
+                       AND size_bigint IS NULL AND size IS NOT NULL)
+    """), {"disk_id": disk_id}).scalar()
+
+
+def _copy_size(session, disk_id: int) -> int:
+    _ensure_size_bigint(session)
+    copied = 0
+    after = 0
+    while True:
+        ids = session.execute(text("""
+            WITH batch AS (
+                SELECT id FROM files
+                WHERE disk_id = :disk_id AND id > :after AND size_bigint IS NULL AND size IS NOT NULL
+                ORDER BY id LIMIT :limit
+            )
+            UPDATE files f SET size_bigint = f.size
+            FROM batch WHERE f.id = batch.id
+            RETURNING f.id
+        """), {"disk_id": disk_id, "after": after, "limit": SIZE_BATCH_ROWS}).scalars().all()
+        session.commit()
+        if not ids:
+            return copied
+        copied += len(ids)
+        after = max(ids)
+
+
+def _size_indexes() -> List[Tuple[str, str, str]]:
+    """(index, index på size_bigint, CREATE INDEX för det) för modellens index på files.size"""
+    indexes = []
+    for index in db.FileEntry.__table__.indexes:
+        if 'size' not in index.columns:
+            continue
+        copy_name = f"{index.name}_bigint"
+        ddl = str(CreateIndex(index).compile(dialect=db.engine.dialect))
+        head, on, columns = ddl.partition(' ON ')
+        head = re.sub(r'^CREATE (UNIQUE )?INDEX \S+', rf'CREATE \1INDEX CONCURRENTLY IF NOT EXISTS {copy_name}', head)
+        indexes.append((index.name, copy_name, head + on + re.sub(r'\bsize\b', 'size_bigint', columns)))
+    return indexes
+
+
+def _size_indexes_needed(session) -> bool:
+    if not _size_is_integer(session) or not _has_size_bigint(session):
+        return False
+    valid = set(session.execute(text("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'files'::regclass AND i.indisvalid
+    """)).scalars())
+    return any(copy_name not in valid for _, copy_name, _ in _size_indexes())
+
+
+def _build_size_indexes(session) -> int:
+    """Index på size_bigint motsvarande dem på size, byggda med CONCURRENTLY före bytet"""
+    _ensure_size_bigint(session)
+    indexes = _size_indexes()
+    with db.bulk_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Samma lås som ensure_indexes - två CONCURRENTLY-byggen ska inte städa efter varandra
+        conn.execute(text("SELECT pg_advisory_lock(:lock)"), {"lock": db.INDEX_BUILD_LOCK})
+        try:
+            invalid = set(conn.execute(text("""
+                SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = 'files'::regclass AND NOT i.indisvalid
+            """)).scalars())
+            for number, (_, copy_name, ddl) in enumerate(indexes, start=1):
+                if copy_name in invalid:
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{copy_name}"'))
+                print(f"   📊 Index {number}/{len(indexes)}: {copy_name} (CONCURRENTLY)")
+                conn.execute(text(ddl))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:lock)"), {"lock": db.INDEX_BUILD_LOCK})
+    return len(indexes)
+
+
+def _swap_size(session) -> int:
+    _ensure_size_bigint(session)
+    # Rader som inte hann kopieras (triggern håller nya i synk) - utan lås
+    caught_up = session.execute(text(
+        "UPDATE files SET size_bigint = size WHERE size_bigint IS DISTINCT FROM size"
+    )).rowcount
+    session.commit()
+    if _size_indexes_needed(session):
+        session.rollback()
+        _build_size_indexes(session)
+    # Under låset bara katalogändringar: inga rader läses eller skrivs
+    session.execute(text("SET LOCAL lock_timeout = '10s'"))
+    session.execute(text("LOCK TABLE files IN ACCESS EXCLUSIVE MODE"))
+    session.execute(text(f"DROP TRIGGER {SIZE_SYNC_TRIGGER} ON files"))
+    session.execute(text("ALTER TABLE files DROP COLUMN size"))  # Tar med sig indexen på size
+    session.execute(text("ALTER TABLE files RENAME COLUMN size_bigint TO size"))
+    for name, copy_name, _ in _size_indexes():
+        session.execute(text(f'ALTER INDEX "{copy_name}" RENAME TO "{name}"'))
+    session.execute(text(f"DROP FUNCTION {SIZE_SYNC_TRIGGER}()"))
+    session.commit()
+    return caught_up
+
+
+# === Index ===
+
+def _missing_indexes(session) -> List[str]:
+    names = [index.name for table in db.Base.metadata.sorted_tables for index in table.indexes]
+    valid = set(session.execute(text("""
+        SELECT c.relname FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE i.indisvalid AND n.nspname = current_schema() AND c.relname = ANY(:names)
+    """), {"names": names}).scalars())
+    return [name for name in names if name not in valid]
+
+
+def _build_indexes(session) -> int:
+    missing = _missing_indexes(session)
+    session.rollback()  # Ingen öppen transaktion medan index byggs
+
+    def progress(done, total, name):
+        if name in missing:
+            print(f"   📊 Index {done + 1}/{total}: {name} (CONCURRENTLY)")
+
+    failed = db.ensure_indexes(progress=progress)
+    if failed:
+        raise RuntimeError(f"{failed} index kunde inte skapas")
+    return len(missing)
+
+
+# === Per disk ===
+
+def _categories_needed(session, disk_id: int) -> bool:
+    return session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM files WHERE disk_id = :disk_id AND category IS NULL)"
+    ), {"disk_id": disk_id}).scalar()
+
+
+def _backfill_categories(session, disk_id: int) -> int:
+    updated = db.backfill_file_categories_for_disk(session, disk_id)
+    session.commit()
+    return updated
+
+
+def _directories_needed(session, disk_id: int) -> bool:
+    return session.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM files WHERE disk_id = :disk_id AND dir_id IS NULL)
+            OR NOT EXISTS (SELECT 1 FROM directories WHERE disk_id = :disk_id AND path = '')
+            OR EXISTS (SELECT 1 FROM directories WHERE disk_id = :disk_id
+                       AND (file_count IS NULL OR subtree_size IS NULL))
+    """), {"disk_id": disk_id}).scalar()
+
+
+def _populate_directories(session, disk_id: int) -> int:
+    return db.populate_directories_for_disk(disk_id)
+
+
+# === Katalogstatistik ===
+
+def _catalog_stats_needed(session) -> bool:
+    stats = session.get(db.CatalogStats, 1)
+    return stats is None or stats.recomputed_at is None
+
+
+def _recompute_catalog_stats(session) -> int:
+    return db.recompute_catalog_stats()['stats']['files']
+
+
+STEPS = [
+    Step('size_copy', "Kopiera files.size till BIGINT-kolumn", True,
+         _size_copy_needed, _copy_size),
+    Step('size_indexes', "Bygg indexen på size för BIGINT-kolumnen (CONCURRENTLY)", False,
+         _size_indexes_needed, _build_size_indexes),
+    Step('size_swap', "Byt files.size mot BIGINT-kolumnen", False,
+         _size_is_integer, _swap_size),
+    Step('indexes', "Bygg saknade index och ta bort ersatta (CONCURRENTLY)", False,
+         lambda session: bool(_missing_indexes(session) or db._replaced_indexes(session)),
+         _build_indexes),
+    Step('categories', "Fyll files.category", True,
+         _categories_needed, _backfill_categories),
+    Step('directories', "Katalograder, files.dir_id och antal/storlek per katalog", True,
+         _directories_needed, _populate_directories),
+    Step('catalog_stats', "Räkna katalogstatistiken från grunden", False,
+         _catalog_stats_needed, _recompute_catalog_stats),
+]
+
+STEP_NAMES = [step.name for step in STEPS]
+
+
+def _record(session, step: Step, disk_id: int, rows: int, seconds: float):
+    session.merge(db.MigrationStep(
+        step=step.name, disk_id=disk_id, rows=rows, seconds=round(seconds, 3),
+        finished_at=datetime.now(timezone.utc)
+    ))
+    session.commit()
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def _run_per_disk(session, step: Step, disks: List, file_counts: Dict[int, int],
+                  only_disk: Optional[int]):
+    pending = [disk for disk in disks
+               if (only_disk is None or disk.id == only_disk) and step.needed(session, disk.id)]
+    session.rollback()
+    if not pending:
+        print(f"✅ [{step.name}] Inget att göra")
+        return
+    total_files = sum(file_counts.get(disk.id, 0) for disk in pending) or 1
+    print(f"▶️ [{step.name}] {step.description}: {len(pending)} diskar")
+    started = time.monotonic()
+    files_done = 0
+    for number, disk in enumerate(pending, start=1):
+        disk_started = time.monotonic()
+        rows = step.run(session, disk.id)
+        seconds = time.monotonic() - disk_started
+        _record(session, step, disk.id, rows, seconds)
+
+        # Kvarvarande tid skattas från filer per sekund hittills
+        files_done += file_counts.get(disk.id, 0)
+        elapsed = time.monotonic() - started
+        remaining = elapsed / files_done * (total_files - files_done) if files_done else 0
+        print(f"📀 [{step.name}] {number}/{len(pending)} {disk.name}: {rows} rader på "
+              f"{seconds:.1f}s - {files_done * 100 // total_files}% klart, "
+              f"ca {_format_seconds(remaining)} kvar")
+
+
+def run_migrations(steps: Optional[List[str]] = None, disk_id: Optional[int] = None):
+    """
+    Kör de migreringssteg som behövs (alla, eller bara steps), eventuellt
+    begränsat till en disk. Kan avbrytas och köras igen - klara diskar hoppas
+    över. MigrationAlreadyRunning om en annan körning pågår.
+    """
+    selected = [step for step in STEPS if steps is None or step.name in steps]
+    with db.bulk_engine.connect() as lock_connection:
+        locked = lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(:lock)"), {"lock": MIGRATION_LOCK}
+        ).scalar()
+        lock_connection.commit()
+        if not locked:
+            raise MigrationAlreadyRunning("En annan migrering körs redan")
+        try:
+            # Nya tabeller och kolumner (bara metadata) - förutsättning för stegen
+            db.init_db()
+            session = db.BulkSessionLocal()
+            try:
+                disks = session.query(db.DiskIndex).order_by(db.DiskIndex.id).all()
+                file_counts = dict(session.execute(
+                    text("SELECT disk_id, count(*) FROM files GROUP BY disk_id")
+                ).all())
+                session.rollback()
+                for step in selected:
+                    if step.per_disk:
+                        _run_per_disk(session, step, disks, file_counts, disk_id)
+                        continue
+                    if not step.needed(session):
+                        session.rollback()
+                        print(f"✅ [{step.name}] Inget att göra")
+                        continue
+                    session.rollback()
+                    print(f"▶️ [{step.name}] {step.description}")
+                    started = time.monotonic()
+                    rows = step.run(session)
+                    seconds = time.monotonic() - started
+                    _record(session, step, 0, rows, seconds)
+                    print(f"✅ [{step.name}] {rows} rader på {_format_seconds(seconds)}")
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:lock)"), {"lock": MIGRATION_LOCK})
+            lock_connection.commit()
+
+
+def migration_status() -> List[Dict]:
+    """Genomförda migreringar per steg: antal diskar, rader, tid och senast klar"""
+    session = db.BulkSessionLocal()
+    try:
+        rows = {row.step: row for row in session.execute(text("""
+            SELECT step, count(*) FILTER (WHERE disk_id <> 0) AS disks, sum(rows) AS rows,
+                   sum(seconds) AS seconds, max(finished_at) AS finished_at
+            FROM schema_migrations GROUP BY step
+        """))}
+        disk_count = session.query(db.DiskIndex).count()
+        return [{
+            'step': step.name,
+            'description': step.description,
+            'per_disk': step.per_disk,
+            'disks_done': rows[step.name].disks if step.name in rows else 0,
+            'disk_count': disk_count if step.per_disk else None,
+            'rows': int(rows[step.name].rows or 0) if step.name in rows else 0,
+            'seconds': float(rows[step.name].seconds or 0) if step.name in rows else 0.0,
+            'finished_at': rows[step.name].finished_at.isoformat()
+            if step.name in rows and rows[step.name].finished_at else None
+        } for step in STEPS]
+    finally:
+        session.close()
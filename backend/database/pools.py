@@ -0,0 +1,109 @@
+# pools.py - Separata anslutningspooler för interaktiva anrop och bulkjobb
+#
+# Importer, katalogbyggen och annat underhåll går via bulk-poolen så att de
+# aldrig kan ta anslutningarna som browse och sök behöver. Varje pool mäter
+# hur länge checkout väntar på en ledig anslutning (syns i /health).
+
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+# Väntetid över detta räknas som långsam checkout
+SLOW_CHECKOUT_SECONDS = 0.1
+
+
+class PoolWaitStats:
+    """Väntetid vid checkout för en pool (antal, summa, max, långsamma, timeouts)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.slow = 0
+        self.timeouts = 0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if wait >= SLOW_CHECKOUT_SECONDS:
+                self.slow += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'slow_checkouts': self.slow,
+                'timeouts': self.timeouts
+            }
+
+
+# Lane -> väntestatistik (överlever att poolen återskapas)
+POOL_WAIT_STATS: Dict[str, PoolWaitStats] = {}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool som mäter väntetiden för varje checkout"""
+
+    lane = 'default'
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            POOL_WAIT_STATS[self.lane].record(time.perf_counter() - start, timed_out=True)
+            raise
+        POOL_WAIT_STATS[self.lane].record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.lane = self.lane
+        return pool
+
+
+def create_lane_engine(db_url: str, lane: str, pool_size: int, max_overflow: int, pool_timeout: float):
+    """
+    Engine med egen instrumenterad pool. Storlekarna kan överstyras med
+    DB_<LANE>_POOL_SIZE, DB_<LANE>_MAX_OVERFLOW och DB_<LANE>_POOL_TIMEOUT.
+    """
+    prefix = f"DB_{lane.upper()}_"
+    engine = create_engine(
+        db_url,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(os.getenv(prefix + "POOL_SIZE", pool_size)),
+        max_overflow=int(os.getenv(prefix + "MAX_OVERFLOW", max_overflow)),
+        pool_timeout=float(os.getenv(prefix + "POOL_TIMEOUT", pool_timeout))
+    )
+    engine.pool.lane = lane
+    POOL_WAIT_STATS.setdefault(lane, PoolWaitStats())
+    return engine
+
+
+def pool_stats(engines: Dict[str, object]) -> Dict:
+    """Aktuell beläggning och väntetider per pool"""
+    result = {}
+    for lane, engine in engines.items():
+        pool = engine.pool
+        result[lane] = {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout_s': pool.timeout(),
+            **POOL_WAIT_STATS[lane].snapshot()
+        }
+    return result
@@ -0,0 +1,155 @@
+# query_guard.py - Tidsgränser, avbrott och köhantering för tunga frågor
+#
+# Endpoints kör tunga databasanrop inom guarded(): varje transaktion som
+# börjar i den tråden får SET LOCAL statement_timeout, och anslutningen
+# registreras så att frågan kan avbrytas (pg cancel) om klienten kopplar ned.
+# AdmissionLimiter begränsar hur många frågor av en klass som körs samtidigt
+# så att de inte tar hela anslutningspoolen.
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+# Postgres SQLSTATE för avbruten fråga (statement_timeout eller pg_cancel)
+QUERY_CANCELED = '57014'
+
+
+class QueryRejected(Exception):
+    """Kön för en frågeklass är full - försök igen senare"""
+
+    def __init__(self, query_class: str, retry_after: int):
+        super().__init__(f"För många samtidiga {query_class}-frågor, försök igen om en stund")
+        self.query_class = query_class
+        self.retry_after = retry_after
+
+
+class QueryGuard:
+    """Tidsgräns och avbrottsmöjlighet för databasfrågorna i ett anrop"""
+
+    def __init__(self, timeout_ms: Optional[int] = None):
+        self.timeout_ms = timeout_ms
+        self.cancelled = False
+        self._connections: Dict[int, object] = {}  # id(session) -> DBAPI-anslutning
+        self._active = False
+        self._lock = threading.Lock()
+
+    def register(self, session, dbapi_connection):
+        with self._lock:
+            self._connections[id(session)] = dbapi_connection
+
+    def unregister(self, session):
+        with self._lock:
+            self._connections.pop(id(session), None)
+
+    def cancel(self):
+        """Avbryt pågående frågor. Före start markeras bara anropet som avbrutet."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            if not self._active:
+                return
+            for connection in self._connections.values():
+                try:
+                    connection.cancel()
+                except Exception as e:
+                    print(f"⚠️ Kunde inte avbryta fråga: {e}")
+
+    @contextmanager
+    def active(self):
+        token = _current_guard.set(self)
+        with self._lock:
+            self._active = True
+        try:
+            yield self
+        finally:
+            # Anslutningarna går tillbaka till poolen - får inte avbrytas efter detta
+            with self._lock:
+                self._active = False
+                self._connections.clear()
+            _current_guard.reset(token)
+
+
+_current_guard: ContextVar[Optional[QueryGuard]] = ContextVar('query_guard', default=None)
+
+
+@contextmanager
+def guarded(timeout_ms: Optional[int] = None):
+    """Kör databasanrop med tidsgräns och möjlighet att avbryta (se QueryGuard)"""
+    with QueryGuard(timeout_ms).active() as guard:
+        yield guard
+
+
+def install_query_guard(session_factory):
+    """Sätt statement_timeout och registrera anslutningen när en transaktion börjar"""
+
+    @event.listens_for(session_factory, 'after_begin')
+    def _apply_query_guard(session, transaction, connection):
+        guard = _current_guard.get()
+        if guard is None:
+            return
+        if guard.timeout_ms:
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(guard.timeout_ms)}")
+        guard.register(session, connection.connection.dbapi_connection)
+
+    @event.listens_for(session_factory, 'after_transaction_end')
+    def _release_query_guard(session, transaction):
+        # Anslutningen går tillbaka till poolen och kan användas av andra anrop
+        guard = _current_guard.get()
+        if guard is not None and transaction.parent is None:
+            guard.unregister(session)
+
+
+def is_query_canceled(error: Exception) -> bool:
+    """Sant om felet kommer från statement_timeout eller ett avbrott"""
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == QUERY_CANCELED
+
+
+class AdmissionLimiter:
+    """
+    Högst limit samtidiga frågor av en klass. Fler anrop köar i upp till
+    queue_timeout sekunder (-1 = utan gräns) och avvisas sedan med QueryRejected.
+    """
+
+    def __init__(self, query_class: str, limit: int, queue_timeout: float):
+        self.query_class = query_class
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self, queue_timeout: Optional[float] = None):
+        with self._lock:
+            self.waiting += 1
+        timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+        acquired = self._semaphore.acquire(timeout=None if timeout < 0 else timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.running += 1
+            else:
+                self.rejected += 1
+        if not acquired:
+            raise QueryRejected(self.query_class, retry_after=max(1, int(self.queue_timeout)))
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'running': self.running,
+                'waiting': self.waiting,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,355 @@
+import heapq
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Typer som kan föreslås (ordning = ordning i svaret)
+SUGGEST_KINDS = ('file', 'folder', 'client', 'project')
+
+
+class _ChunkedKeys:
+    """
+    Sorterade nycklar i block om högst 2 * LOAD.
+
+    En ny nyckel kopierar bara sitt block (copy-on-write), så läsare som går
+    igenom ett intervall samtidigt ser antingen det gamla eller det nya blocket
+    och ingen omsortering av alla nycklar behövs.
+    """
+
+    __slots__ = ('_state',)
+
+    LOAD = 1000
+
+    def __init__(self, keys: List[str]):
+        chunks = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._state = (chunks, [chunk[-1] for chunk in chunks])
+
+    def add(self, key: str):
+        chunks, maxes = self._state
+        if not chunks:
+            self._state = ([[key]], [key])
+            return
+        i = min(bisect_left(maxes, key), len(maxes) - 1)
+        chunk = chunks[i]
+        j = bisect_left(chunk, key)
+        if j < len(chunk) and chunk[j] == key:
+            return
+        new = chunk[:j] + [key] + chunk[j:]
+        if len(new) > 2 * self.LOAD:
+            half = len(new) // 2
+            self._state = (chunks[:i] + [new[:half], new[half:]] + chunks[i + 1:],
+                           maxes[:i] + [new[half - 1], new[-1]] + maxes[i + 1:])
+        else:
+            chunks[i] = new
+            maxes[i] = new[-1]
+
+    def remove(self, key: str):
+        chunks, maxes = self._state
+        i = bisect_left(maxes, key)
+        if i == len(chunks):
+            return
+        chunk = chunks[i]
+        j = bisect_left(chunk, key)
+        if j == len(chunk) or chunk[j] != key:
+            return
+        new = chunk[:j] + chunk[j + 1:]
+        if not new:
+            self._state = (chunks[:i] + chunks[i + 1:], maxes[:i] + maxes[i + 1:])
+        else:
+            chunks[i] = new
+            maxes[i] = new[-1]
+
+    def iter_prefix(self, prefix: str) -> Iterator[str]:
+        chunks, maxes = self._state
+        i = bisect_left(maxes, prefix)
+        while i < len(chunks):
+            chunk = chunks[i]
+            for j in range(bisect_left(chunk, prefix), len(chunk)):
+                if not chunk[j].startswith(prefix):
+                    return
+                yield chunk[j]
+            i += 1
+
+
+class _KindIndex:
+    """
+    Prefix-index för en typ.
+
+    Antal per nyckel (gemener) ligger i en dict och nycklarna sorterade i
+    _ChunkedKeys. För varje prefix som matchar fler än heavy_limit nycklar
+    hålls en topplista med högst 2 * top_k nycklar och ett golv: ingen nyckel
+    utanför listan har större antal än golvet. Listorna uppdateras per ändrad
+    nyckel; bara när för få medlemmar ligger över golvet (efter minskningar)
+    räknas listan om från prefixets intervall.
+    """
+
+    __slots__ = ('top_k', 'heavy_limit', 'size', 'entries', 'keys', 'top', '_dirty')
+
+    def __init__(self, top_k: int, heavy_limit: int):
+        self.top_k = top_k
+        self.heavy_limit = heavy_limit
+        self.size = 2 * top_k
+        self.entries: Dict[str, list] = {}  # nyckel -> [visningsnamn, antal]
+        self.keys = _ChunkedKeys([])
+        self.top: Dict[str, Tuple[Tuple[str, ...], int]] = {}  # prefix -> (nycklar, golv)
+        self._dirty = set()
+
+    def count(self, key: str) -> int:
+        entry = self.entries.get(key)
+        return entry[1] if entry else 0
+
+    def _make_top(self, best: List[Tuple[int, str]]) -> Tuple[Tuple[str, ...], int]:
+        """Topplista och golv ur de size + 1 största (antal, nyckel)"""
+        floor = best[self.size][0] if len(best) > self.size else 0
+        return tuple(key for _, key in best[:self.size]), floor
+
+    def load(self, entries: Dict[str, list]):
+        """Bygg från grunden (vid uppstart) - enda gången alla nycklar sorteras"""
+        keys = sorted(entries)
+
+        # Tunga prefix nivå för nivå: bara förlängningar av ett tungt prefix kan vara tunga
+        heavy = set()
+        candidates = keys
+        length = 1
+        while candidates:
+            level = {prefix for prefix, n in
+                     Counter(key[:length] for key in candidates if len(key) >= length).items()
+                     if n > self.heavy_limit}
+            heavy |= level
+            candidates = [key for key in candidates if key[:length] in level]
+            length += 1
+
+        # Topplistor för alla tunga prefix i ett svep
+        heaps = {prefix: [] for prefix in heavy}
+        for key in keys:
+            item = (entries[key][1], key)
+            for length in range(1, len(key) + 1):
+                heap = heaps.get(key[:length])
+                if heap is None:
+                    break
+                if len(heap) <= self.size:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        self.entries = entries
+        self.keys = _ChunkedKeys(keys)
+        self.top = {prefix: self._make_top(sorted(heap, reverse=True)) for prefix, heap in heaps.items()}
+        self._dirty = set()
+
+    def refresh_top(self, prefix: str):
+        """Räkna om topplistan för prefix från dess intervall"""
+        best = heapq.nlargest(self.size + 1, ((self.count(key), key) for key in self.keys.iter_prefix(prefix)))
+        self.top[prefix] = self._make_top(best)
+
+    def apply(self, value: str, delta: int):
+        key = value.lower()
+        entry = self.entries.get(key)
+        if entry is None:
+            if delta <= 0:
+                return
+            self.entries[key] = [value if value != key else key, delta]
+            self.keys.add(key)
+            count = delta
+        else:
+            entry[1] += delta
+            count = entry[1]
+            if count <= 0:
+                del self.entries[key]
+                self.keys.remove(key)
+                count = 0
+
+        for length in range(1, len(key) + 1):
+            prefix = key[:length]
+            top = self.top.get(prefix)
+            if top is None:
+                continue
+            members, floor = top
+            if key in members:
+                if delta < 0:
+                    if count == 0:
+                        self.top[prefix] = (tuple(m for m in members if m != key), floor)
+                    self._dirty.add(prefix)
+            elif count > floor:
+                members = members + (key,)
+                if len(members) > self.size:
+                    lowest = min(members, key=self.count)
+                    floor = max(floor, self.count(lowest))
+                    members = tuple(m for m in members if m != lowest)
+                self.top[prefix] = (members, floor)
+
+    def validate(self):
+        """Räkna om topplistor där färre än top_k medlemmar säkert hör till toppen"""
+        for prefix in self._dirty:
+            members, floor = self.top[prefix]
+            if floor and sum(1 for m in members if self.count(m) >= floor) < self.top_k:
+                self.refresh_top(prefix)
+        self._dirty = set()
+
+    def lookup(self, prefix: str, limit: int) -> Optional[List[dict]]:
+        """
+        Vanligaste posterna som börjar med prefix. None om prefixet matchar fler
+        än heavy_limit nycklar och saknar topplista (anroparen skapar den).
+        """
+        top = self.top.get(prefix)
+        if top is not None:
+            keys = top[0]
+        else:
+            keys = []
+            for key in self.keys.iter_prefix(prefix):
+                keys.append(key)
+                if len(keys) > self.heavy_limit:
+                    return None
+        ranked = heapq.nsmallest(limit, keys, key=lambda k: (-self.count(k), k))
+        result = []
+        for key in ranked:
+            entry = self.entries.get(key)
+            if entry:
+                result.append({'value': entry[0], 'count': entry[1]})
+        return result
+
+
+class SuggestIndex:
+    """
+    Prefix-index i minnet för /suggest (filnamn, mappnamn, kunder, projekt).
+
+    Byggs från hela katalogen vid uppstart. Därefter ändras bara de nycklar som
+    en import, radering eller ny kund/projekt-mappning berör (+/- antal per
+    nyckel). Diskar som ändras medan uppstartsbygget pågår köas och stäms av
+    när bygget är klart. Frågor läser utan lås.
+    """
+
+    def __init__(self, top_k: int = 20, scan_limit: int = 20000, cache_size: int = 1024):
+        self.top_k = top_k
+        self.scan_limit = scan_limit
+        self.cache_size = cache_size
+        self.ready = False
+        self.built_at = None
+
+        self._kinds = {kind: _KindIndex(top_k, scan_limit) for kind in SUGGEST_KINDS}
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._building = False
+        self._queued = []  # Diskar ändrade under bygget
+        self._queue_lock = threading.Lock()
+
+    def _clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def begin_build(self):
+        with self._queue_lock:
+            self._building = True
+            self._queued = []
+
+    def load(self, rows: Iterable[Tuple[str, str, int]]):
+        """Bygg från grunden av (typ, värde, antal) för hela katalogen"""
+        entries = {kind: {} for kind in SUGGEST_KINDS}
+        for kind, value, count in rows:
+            if not value:
+                continue
+            key = value.lower()
+            entry = entries[kind].get(key)
+            if entry is None:
+                entries[kind][key] = [value if value != key else key, count]
+            else:
+                entry[1] += count
+        kinds = {kind: _KindIndex(self.top_k, self.scan_limit) for kind in SUGGEST_KINDS}
+        for kind in SUGGEST_KINDS:
+            kinds[kind].load(entries[kind])
+        with self._lock:
+            self._kinds = kinds
+        self._clear_cache()
+
+    def finish_build(self, refresh_disk: Callable[[int], Tuple[list, list]]):
+        """
+        Stäm av köade diskar och markera indexet klart. refresh_disk(disk_id)
+        returnerar (rader som finns med i indexet, rader som gäller nu).
+        """
+        while True:
+            with self._queue_lock:
+                if not self._queued:
+                    self._building = False
+                    self.ready = True
+                    self.built_at = datetime.now().isoformat()
+                    return
+                disk_id = self._queued.pop(0)
+            included, current = refresh_disk(disk_id)
+            self.apply(included, sign=-1)
+            self.apply(current)
+
+    def abort_build(self):
+        with self._queue_lock:
+            self._building = False
+            self._queued = []
+
+    def defer(self, disk_id: int) -> bool:
+        """
+        Sant om en ändring av disken inte ska tillämpas nu: bygget pågår (disken
+        köas och stäms av efteråt) eller indexet har aldrig byggts.
+        """
+        with self._queue_lock:
+            if self._building:
+                if disk_id not in self._queued:
+                    self._queued.append(disk_id)
+                return True
+            return not self.ready
+
+    def apply(self, rows: Iterable[Tuple[str, str, int]], sign: int = 1):
+        """Lägg till (sign=1) eller dra ifrån (sign=-1) rader av (typ, värde, antal)"""
+        with self._lock:
+            touched = set()
+            for kind, value, count in rows:
+                if not value:
+                    continue
+                self._kinds[kind].apply(value, sign * count)
+                touched.add(kind)
+            for kind in touched:
+                self._kinds[kind].validate()
+        self._clear_cache()
+
+    def suggest(self, prefix: str, kinds: Optional[List[str]] = None, limit: int = 10) -> Dict:
+        """Vanligaste träffar per typ som börjar med prefix"""
+        prefix = (prefix or '').strip().lower()
+        kinds = tuple(k for k in (kinds or SUGGEST_KINDS) if k in SUGGEST_KINDS)
+        limit = min(limit, self.top_k)
+        if not prefix:
+            return {kind: [] for kind in kinds}
+
+        cache_key = (prefix, kinds, limit)
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+
+        result = {}
+        for kind in kinds:
+            kind_index = self._kinds[kind]
+            found = kind_index.lookup(prefix, limit)
+            if found is None:
+                # Prefixet har vuxit förbi scan_limit sedan bygget - skapa dess topplista
+                with self._lock:
+                    if prefix not in kind_index.top:
+                        kind_index.refresh_top(prefix)
+                found = kind_index.lookup(prefix, limit)
+            result[kind] = found
+
+        with self._cache_lock:
+            self._cache[cache_key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict:
+        kinds = self._kinds
+        return {
+            'ready': self.ready,
+            'built_at': self.built_at,
+            'entries': {kind: len(kinds[kind].entries) for kind in SUGGEST_KINDS},
+            'top_prefixes': {kind: len(kinds[kind].top) for kind in SUGGEST_KINDS}
+        }
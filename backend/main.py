@@ -1,38 +1,86 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Query
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse, Response, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func, text
 import asyncio
 import uuid
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 import threading
 import os
 import json
+import gzip
+import csv
+import io
+import zlib
 import shutil
 import re
 from datetime import datetime
 
+# orjson är valfritt - utan det används standard-JSON
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from database.query_guard import AdmissionLimiter, QueryGuard, QueryRejected, is_query_canceled
+
 # Import alla funktioner från db_manager
 from database.db_manager import (
     init_db,
+    ensure_indexes,
+    backfill_file_categories,
+    ensure_catalog_stats,
+    update_catalog_stats_for_disk,
+    recompute_catalog_stats,
+    determine_file_type,
     get_session,
     add_disk,
     get_disk_by_id,
     get_disk_by_name,
     get_all_disks,
+    get_disk_ids,
     delete_disk,
     get_files_by_disk,
     get_directories,
-    get_files_in_directory,
+    get_directory_tree,
+    get_directory_treemap,
+    get_disk_manifest,
+    iter_file_export,
+    EXPORT_COLUMNS,
+    get_files_in_directory_page,
     search_files,
+    get_search_facets,
+    invalidate_search_caches,
+    build_suggest_index,
+    update_suggest_index_for_disk,
+    suggest,
     get_system_stats,
+    get_date_histogram,
+    parse_timestamp,
+    path_mapping_values,
+    set_disk_path_mapping,
     populate_directories_for_disk,
+    backfill_directory_counts,
+    ensure_directory_ids,
+    normalize_directory_path,
+    query_files_with_path,
+    FILE_DIR_PATH,
     extract_all_files,
     extract_all_files_with_paths,
     get_disk_info,
+    refresh_duplicates_for_disk,
+    rebuild_duplicates,
+    get_duplicates,
     format_file_size,
     SessionLocal,
+    BulkSessionLocal,
+    get_pool_stats,
     FileEntry,
     DirectoryEntry,
     DiskIndex
@@ -60,6 +108,77 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZip för stora svar, men inte för strömmar som ska komma fram direkt
+    (Server-Sent Events) eller svar som redan är gzip-filer (application/gzip,
+    t.ex. exporter med compress). Svar som redan har Content-Encoding (t.ex.
+    manifestet) skickas orörda.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "text/event-stream" in headers.get("accept", "") or scope["path"].endswith("/stream"):
+                await self.app(scope, receive, send)
+                return
+            if "gzip" in headers.get("accept-encoding", ""):
+                responder = GZipResponder(self._skip_gzip_files(send), self.minimum_size,
+                                          compresslevel=self.compresslevel)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    def _skip_gzip_files(self, send):
+        """Appen bakom GZipResponder: application/gzip-svar går direkt till klienten"""
+        async def app(scope, receive, gzip_send):
+            target = gzip_send
+
+            async def route(message):
+                nonlocal target
+                if message["type"] == "http.response.start":
+                    content_type = Headers(raw=message["headers"]).get("content-type", "")
+                    target = send if content_type.startswith("application/gzip") else gzip_send
+                await target(message)
+
+            await self.app(scope, receive, route)
+        return app
+
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Snabb JSON för listor: orjson om det finns, och förbi FastAPIs jsonable_encoder
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """'name,size' -> ['name', 'size'] (None = alla fält)"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return list(dict.fromkeys(names)) or None
+
+def list_response(body: dict, key: str, allowed: tuple, fields: Optional[List[str]] = None,
+                  compact: bool = False) -> Response:
+    """
+    Svar med en lista av dictar under body[key].
+
+    fields begränsar varje rad till de fälten; okända namn (inte i allowed,
+    endpointens fält) ger 400. Fält som saknas i en rad blir null. Med
+    compact=True skickas raderna som listor och kolumnnamnen en gång i
+    body["columns"].
+    """
+    unknown = [name for name in fields or () if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Okända fält: {', '.join(unknown)} (tillåtna: {', '.join(allowed)})")
+    items = body[key]
+    if compact:
+        columns = fields or list(dict.fromkeys(name for item in items for name in item))
+        body[key] = [[item.get(name) for name in columns] for item in items]
+        body["columns"] = columns
+    elif fields:
+        body[key] = [{name: item.get(name) for name in fields} for item in items]
+    return FastJSONResponse(body)
+
 UPLOAD_DIR = "/app/data/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -67,9 +186,103 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 progress_store: Dict[str, dict] = {}
 progress_lock = threading.Lock()
 
+# === Tunga frågor: köplatser, statement_timeout och avbrott ===
+# Högst N samtidiga frågor per klass så att de inte tar hela anslutningspoolen
+# (browse och andra korta anrop får alltid plats). Sök-anrop köar några
+# sekunder och får sedan 503; exporter och underhåll (omräkningar som läser
+# hela katalogen, en i taget) köar utan gräns.
+QUERY_CLASSES = {
+    "search": AdmissionLimiter("search", int(os.getenv("SEARCH_CONCURRENCY", "4")),
+                               float(os.getenv("SEARCH_QUEUE_TIMEOUT", "5"))),
+    "stats": AdmissionLimiter("stats", int(os.getenv("STATS_CONCURRENCY", "1")),
+                              float(os.getenv("STATS_QUEUE_TIMEOUT", "10"))),
+    "export": AdmissionLimiter("export", int(os.getenv("EXPORT_CONCURRENCY", "2")), -1),
+    "maintenance": AdmissionLimiter("maintenance", 1, -1),
+}
+# statement_timeout per klass i ms (0 = ingen gräns)
+STATEMENT_TIMEOUTS_MS = {
+    "search": int(os.getenv("SEARCH_STATEMENT_TIMEOUT_MS", "15000")),
+    "stats": int(os.getenv("STATS_STATEMENT_TIMEOUT_MS", "120000")),
+    "export": 0,
+    "maintenance": 0,
+}
+DISCONNECT_POLL_SECONDS = 0.25
+
+async def run_guarded(request: Optional[Request], query_class: str, func, *args, **kwargs):
+    """
+    Kör ett tungt databasanrop i en tråd med köplats i frågeklassen och
+    statement_timeout. Kopplar klienten ned medan frågan körs avbryts den i
+    Postgres (eller körs inte alls om den fortfarande står i kö).
+
+    Nedkoppling märks på två sätt: request pollas (vanliga svar), eller så
+    avbryts anropet (CancelledError) - så gör Starlette med strömmande svar,
+    som därför anropar med request=None för att inte konkurrera om receive().
+    """
+    guard = QueryGuard(STATEMENT_TIMEOUTS_MS[query_class])
+    
+    def run():
+        with QUERY_CLASSES[query_class].slot():
+            if guard.cancelled:
+                return None
+            with guard.active():
+                return func(*args, **kwargs)
+    
+    task = asyncio.ensure_future(run_in_threadpool(run))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if request is not None and not task.done() and await request.is_disconnected():
+                print(f"🔌 Klienten kopplade ned - avbryter {query_class}-fråga")
+                guard.cancel()
+                break
+        result = await task
+    except asyncio.CancelledError:
+        # Tråden går inte att avbryta - frågan i Postgres gör det, och köplatsen släpps
+        print(f"🔌 Anropet avbröts - avbryter {query_class}-fråga")
+        guard.cancel()
+        # Ingen väntar på tråden längre - hämta dess (avbrotts)fel så att det inte loggas
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        raise
+    except QueryRejected as e:
+        print(f"🚦 {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        if not is_query_canceled(e):
+            raise
+        if guard.cancelled:
+            raise HTTPException(status_code=499, detail="Klienten kopplade ned")
+        print(f"⏱️ {query_class}-fråga avbruten efter {STATEMENT_TIMEOUTS_MS[query_class]} ms")
+        raise HTTPException(status_code=504, detail="Frågan tog för lång tid - förfina sökningen med fler filter")
+    if guard.cancelled:
+        raise HTTPException(status_code=499, detail="Klienten kopplade ned")
+    return result
+
+def guarded_export(batches):
+    """Exportrader med köplats i export-klassen medan strömmen pågår"""
+    with QUERY_CLASSES["export"].slot():
+        yield from batches
+
+# Senast en disk öppnades (disk_id -> time.time()) - strömmad sökning börjar där
+disk_last_used: Dict[int, float] = {}
+
+def touch_disk(disk_id: int):
+    disk_last_used[disk_id] = time.time()
+
 @app.on_event("startup")
 def startup():
     init_db()
+    # Index som lagts till i modellerna byggs i bakgrunden (CONCURRENTLY)
+    threading.Thread(target=ensure_indexes, daemon=True).start()
+    # Filer importerade innan category-kolumnen fanns får sin kategori i efterhand,
+    # därefter räknas katalogstatistiken fram om den aldrig gjorts och kataloger
+    # normaliserade innan antalskolumnerna fanns får sina antal
+    def prepare_catalog():
+        backfill_file_categories()
+        ensure_catalog_stats()
+        backfill_directory_counts()
+    threading.Thread(target=prepare_catalog, daemon=True).start()
+    # Förslagsindexet byggs från katalogen i bakgrunden; /suggest svarar ready=false tills dess
+    threading.Thread(target=build_suggest_index, daemon=True).start()
 
 @app.get("/")
 def root():
@@ -87,9 +300,11 @@ def root():
             "files_in_directory": "/disks/{disk_identifier}/files-in-directory",
             "browse": "/disks/{disk_identifier}/browse",
             "search": "/search",
+            "suggest": "/suggest",
             "upload_json": "/upload/json-index",
             "upload_json_async": "/upload/json-index-async",
             "stats": "/stats",
+            "duplicates": "/duplicates",
             "docs": "/docs"
         }
     }
@@ -102,7 +317,12 @@ def health_check():
         try:
             session.execute(text("SELECT 1"))
             session.close()
-            return {"status": "healthy", "database": "connected"}
+            return {
+                "status": "healthy",
+                "database": "connected",
+                "query_classes": {name: limiter.stats() for name, limiter in QUERY_CLASSES.items()},
+                "pools": get_pool_stats()
+            }
         except Exception as db_error:
             session.close()
             return {"status": "unhealthy", "database": "disconnected", "error": str(db_error)}
@@ -145,6 +365,7 @@ def get_disk(disk_identifier: str):
         if not disk_data:
             raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
         
+        touch_disk(disk_data["id"])
         return disk_data
             
     except HTTPException:
@@ -153,70 +374,82 @@ def get_disk(disk_identifier: str):
         print(f"❌ Error fetching disk {disk_identifier}: {e}")
         raise HTTPException(status_code=500, detail=f"Kunde inte hämta disk: {str(e)}")
 
+# Fält per fil i /disks/{id}/files (för fields=)
+DISK_FILE_FIELDS = ("id", "filename", "file_path", "full_path", "file_size", "file_type", "category",
+                    "mime_type", "client", "project", "keywords", "checksum")
+
 @app.get("/disks/{disk_identifier}/files")
-def get_disk_files(
+async def get_disk_files(
+    request: Request,
     disk_identifier: str,
     page: int = Query(1, ge=1),
     per_page: int = Query(100, ge=1, le=1000),
-    path: Optional[str] = None
+    path: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Kommaseparerade fält per fil, t.ex. id,filename,file_size"),
+    compact: bool = Query(False, description="Rader som listor + columns i stället för objekt")
 ):
     """Hämta filer från en specifik hårddisk"""
     try:
         print(f"🔍 Fetching files for disk: {disk_identifier}, path: {path}")
         
-        # Hitta disk ID
-        disk_id_int = None
-        try:
-            disk_id_int = int(disk_identifier)
-        except ValueError:
-            disk = get_disk_by_name(disk_identifier)
-            if disk:
-                disk_id_int = disk.id
-            else:
-                raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
-        
-        session = SessionLocal()
-        try:
-            # Grundläggande query
-            query = session.query(FileEntry).filter(FileEntry.disk_id == disk_id_int)
-            
-            # Lägg till path-filter om det finns
-            if path:
-                query = query.filter(FileEntry.path.like(f"{path}%"))
-            
-            # Räkna totalt antal först
-            total_count = query.count()
-            
-            # Hämta filer med pagination
-            files = query.order_by(FileEntry.path, FileEntry.name).offset((page - 1) * per_page).limit(per_page).all()
-            
-            file_list = []
-            for file in files:
-                file_info = {
-                    "id": file.id,
-                    "filename": file.name,
-                    "file_path": file.path,
-                    "full_path": f"{file.path}/{file.name}" if file.path else file.name,
-                    "file_size": file.size,
-                    "file_type": file.file_type,
-                    "mime_type": file.mime_type,
-                    "client": file.client,
-                    "project": file.project,
-                    "keywords": file.keywords,
-                    "checksum": file.checksum
-                }
-                file_list.append(file_info)
-            
-            print(f"✅ Returning {len(file_list)} files out of {total_count} total")
+        def load_page():
+            # Hitta disk ID
+            disk_id_int = None
+            try:
+                disk_id_int = int(disk_identifier)
+            except ValueError:
+                disk = get_disk_by_name(disk_identifier)
+                if disk:
+                    disk_id_int = disk.id
+                else:
+                    raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
             
-            return {
-                "files": file_list,
-                "total_count": total_count,
-                "page": page,
-                "per_page": per_page
-            }
-        finally:
-            session.close()
+            session = SessionLocal()
+            try:
+                # Grundläggande query (katalogsökvägen via directories)
+                query = query_files_with_path(session).filter(FileEntry.disk_id == disk_id_int)
+                
+                # Lägg till path-filter om det finns
+                if path:
+                    query = query.filter(FILE_DIR_PATH.like(f"{path}%"))
+                
+                # Räkna totalt antal först
+                total_count = query.count()
+                
+                # Hämta filer med pagination
+                files = query.order_by(FILE_DIR_PATH, FileEntry.name).offset((page - 1) * per_page).limit(per_page).all()
+                
+                file_list = []
+                for file, dir_path in files:
+                    file_info = {
+                        "id": file.id,
+                        "filename": file.name,
+                        "file_path": dir_path,
+                        "full_path": f"{dir_path}/{file.name}" if dir_path else file.name,
+                        "file_size": file.size,
+                        "file_type": file.file_type,
+                        "category": file.category,
+                        "mime_type": file.mime_type,
+                        "client": file.client,
+                        "project": file.project,
+                        "keywords": file.keywords,
+                        "checksum": file.checksum
+                    }
+                    file_list.append(file_info)
+                return file_list, total_count
+            finally:
+                session.close()
+        
+        # Räkning + OFFSET över hela disken är tung - samma köplatser som sökning
+        file_list, total_count = await run_guarded(request, "search", load_page)
+        print(f"✅ Returning {len(file_list)} files out of {total_count} total")
+        
+        return list_response({
+            "files": file_list,
+            "total_count": total_count,
+            "page": page,
+            "per_page": per_page
+        }, "files", DISK_FILE_FIELDS, parse_fields(fields), compact)
     except HTTPException:
         raise
     except Exception as e:
@@ -259,11 +492,15 @@ def get_disk_directories(
 @app.get("/disks/{disk_identifier}/files-in-directory")
 def get_files_in_directory_endpoint(
     disk_identifier: str,
-    directory_path: Optional[str] = Query(None, description="Directory path")
+    directory_path: Optional[str] = Query(None, description="Directory path"),
+    sort: str = Query("name", description="name, size, type eller modified"),
+    order: str = Query("asc", description="asc eller desc"),
+    limit: int = Query(500, ge=1, le=5000, description="Antal filer per sida"),
+    cursor: Optional[str] = Query(None, description="next_cursor från föregående sida")
 ):
-    """Hämta bara filer i en specifik mapp"""
+    """Hämta bara filer i en specifik mapp (sorterat, en sida i taget)"""
     try:
-        print(f"📄 File fetch: disk={disk_identifier}, dir='{directory_path or 'ROOT'}'")
+        print(f"📄 File fetch: disk={disk_identifier}, dir='{directory_path or 'ROOT'}', sort={sort} {order}")
         
         # Hitta disk ID
         disk_id_int = None
@@ -276,12 +513,20 @@ def get_files_in_directory_endpoint(
             else:
                 raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
         
-        files = get_files_in_directory(disk_id_int, directory_path or "")
-        print(f"⚡ Return: {len(files)} files")
+        try:
+            page = get_files_in_directory_page(disk_id_int, directory_path or "", sort=sort, order=order,
+                                               limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        print(f"⚡ Return: {len(page['files'])} files")
         
         return {
-            "files": files,
-            "directory_path": directory_path
+            "files": page["files"],
+            "directory_path": directory_path,
+            "next_cursor": page["next_cursor"],
+            "total_count": page["total_count"],
+            "sort": sort,
+            "order": order
         }
     except HTTPException:
         raise
@@ -289,84 +534,113 @@ def get_files_in_directory_endpoint(
         print(f"❌ Files fetch error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Diskar vars directories byggs i bakgrunden efter en fallback-browse
+directory_builds: set = set()
+directory_builds_lock = threading.Lock()
+
+def build_directories_in_background(disk_id_int: int):
+    """Starta populate_directories_for_disk i en tråd (högst en per disk)"""
+    with directory_builds_lock:
+        if disk_id_int in directory_builds:
+            return
+        directory_builds.add(disk_id_int)
+
+    def run():
+        try:
+            print(f"📁 Building directories for disk {disk_id_int} in background...")
+            created = populate_directories_for_disk(disk_id_int)
+            print(f"✅ Created {created} directory entries for disk {disk_id_int}")
+        except Exception as e:
+            print(f"❌ Background directory build failed for disk {disk_id_int}: {e}")
+        finally:
+            with directory_builds_lock:
+                directory_builds.discard(disk_id_int)
+
+    threading.Thread(target=run, daemon=True).start()
+
 def browse_directory_fallback(disk_id_int: int, path: Optional[str]):
-    """Fallback-metod som använder files-tabellen för att bygga directory-view"""
+    """
+    Fallback för diskar utan directories-rader: en nivå listas direkt ur
+    files.path i databasen (nästa sökvägssegment + filerna i mappen).
+    """
     
     print(f"🔄 Fallback browse for path: '{path or 'ROOT'}'")
     
+    current_path = normalize_directory_path(path)
+    params = {"disk_id": disk_id_int, "path": current_path}
+    
     session = SessionLocal()
     try:
-        # Hämta alla filer från disken
-        all_files = session.query(FileEntry).filter(FileEntry.disk_id == disk_id_int).order_by(FileEntry.path, FileEntry.name).all()
-        
-        # Organisera items för nuvarande path
-        items = []
-        folders = set()
-        
-        current_path = path or ""
-        
-        for file in all_files:
-            file_path = file.path or ""  # Hantera NULL values
-            
-            if current_path == "":
-                # Vi är i root - visa toppnivå mappar och filer
-                if file_path == "":
-                    # Fil i root
-                    items.append({
-                        "filename": file.name,
-                        "type": "file",
-                        "file_size": file.size,
-                        "file_type": file.file_type,
-                        "client": file.client,
-                        "project": file.project
-                    })
-                else:
-                    # Fil i mapp - extrahera första mapp-nivån
-                    first_folder = file_path.split('/')[0]
-                    if first_folder:
-                        folders.add(first_folder)
-            else:
-                # Vi är i en specifik mapp
-                if file_path == current_path:
-                    # Fil direkt i denna mapp
-                    items.append({
-                        "filename": file.name,
-                        "type": "file",
-                        "file_size": file.size,
-                        "file_type": file.file_type,
-                        "client": file.client,
-                        "project": file.project
-                    })
-                elif file_path.startswith(current_path + "/"):
-                    # Fil i undermapp till denna mapp
-                    relative_path = file_path[len(current_path) + 1:]
-                    next_folder = relative_path.split('/')[0]
-                    if next_folder:
-                        folders.add(next_folder)
-        
-        # Lägg till mappar först
-        for folder_name in sorted(folders):
-            items.insert(0, {
-                "filename": folder_name,
-                "type": "folder",
-                "file_size": None,
-                "file_count": 0,  # Vi beräknar inte detta i fallback
-                "subdirectory_count": 0,
-                "path": f"{current_path}/{folder_name}" if current_path else folder_name
-            })
-        
-        print(f"🔄 Fallback result: {len(folders)} folders, {len(items) - len(folders)} files")
-        
-        return items
+        # Undermappar: första segmentet efter current_path för filer längre ner
+        if current_path:
+            folders = session.execute(text("""
+                SELECT DISTINCT split_part(substr(path, length(:path) + 2), '/', 1) AS folder
+                FROM files
+                WHERE disk_id = :disk_id AND left(path, length(:path) + 1) = :path || '/'
+                ORDER BY 1
+            """), params).scalars().all()
+        else:
+            folders = session.execute(text("""
+                SELECT DISTINCT split_part(path, '/', 1) AS folder
+                FROM files
+                WHERE disk_id = :disk_id AND path <> ''
+                ORDER BY 1
+            """), params).scalars().all()
+        
+        # Filer direkt i mappen
+        files = session.query(FileEntry).filter(
+            FileEntry.disk_id == disk_id_int,
+            func.coalesce(FileEntry.path, '') == current_path
+        ).order_by(FileEntry.name).all()
     finally:
         session.close()
+    
+    # Lägg till mappar först
+    items = [{
+        "filename": folder_name,
+        "type": "folder",
+        "file_size": None,
+        "file_count": 0,  # Vi beräknar inte detta i fallback
+        "subdirectory_count": 0,
+        "path": f"{current_path}/{folder_name}" if current_path else folder_name
+    } for folder_name in folders if folder_name]
+    
+    for file in files:
+        items.append({
+            "filename": file.name,
+            "type": "file",
+            "file_size": file.size,
+            "file_type": file.file_type,
+            "category": file.category,
+            "client": file.client,
+            "project": file.project
+        })
+    
+    print(f"🔄 Fallback result: {len(items) - len(files)} folders, {len(files)} files")
+    
+    return items
+
+# Fält per mapp/fil i /disks/{id}/browse (för fields=)
+BROWSE_ITEM_FIELDS = ("filename", "type", "path", "file_size", "file_count", "subdirectory_count",
+                      "file_type", "category", "modified_date", "client", "project")
 
 @app.get("/disks/{disk_identifier}/browse")
 def browse(
     disk_identifier: str,
-    path: Optional[str] = Query(None, description="Directory path")
+    path: Optional[str] = Query(None, description="Directory path"),
+    sort: str = Query("name", description="name, size, type eller modified"),
+    order: str = Query("asc", description="asc eller desc"),
+    limit: int = Query(500, ge=1, le=5000, description="Antal filer per sida"),
+    cursor: Optional[str] = Query(None, description="next_cursor från föregående sida"),
+    fields: Optional[str] = Query(None, description="Kommaseparerade fält per post, t.ex. filename,type,file_size"),
+    compact: bool = Query(False, description="Rader som listor + columns i stället för objekt")
 ):
-    """Kombinerad endpoint - hämta både mappar och filer för en nivå"""
+    """
+    Kombinerad endpoint - hämta både mappar och filer för en nivå.
+
+    Filerna sorteras i databasen och kommer en sida (limit) i taget; nästa sida
+    hämtas med cursor=next_cursor. Mapparna skickas bara med på första sidan.
+    """
     try:
         print(f"🗂️ Browse: disk={disk_identifier}, path='{path or 'ROOT'}'")
         
@@ -386,16 +660,35 @@ def browse(
             else:
                 raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
         
-        # Kontrollera först om vi har data i directories-tabellen
+        touch_disk(disk_id_int)
+        
+        # Kontrollera först om vi har data i directories-tabellen (och om disken
+        # är normaliserad, dvs har en rotkatalog)
         session = SessionLocal()
-        directory_count = session.query(DirectoryEntry).filter(DirectoryEntry.disk_id == disk_id_int).count()
-        session.close()
+        try:
+            directory_paths = [row[0] for row in session.query(DirectoryEntry.path).filter(
+                DirectoryEntry.disk_id == disk_id_int
+            ).order_by(DirectoryEntry.path).limit(1)]
+        finally:
+            session.close()
         
-        if directory_count > 0:
-            print(f"📁 Using fast directories table ({directory_count} dirs)")
+        if directory_paths:
+            if directory_paths[0] != '':
+                # Äldre katalograder utan rot - normalisera i bakgrunden
+                build_directories_in_background(disk_id_int)
+            print(f"📁 Using fast directories table")
             # Använd den snabba directories-metoden
-            dirs_result = get_directories(disk_id_int, path)
-            files_result = get_files_in_directory(disk_id_int, path or "")
+            dirs_result = get_directories(disk_id_int, path) if cursor is None else []
+            if sort == "name" and order == "desc":
+                dirs_result.reverse()
+            try:
+                page = get_files_in_directory_page(disk_id_int, path or "", sort=sort, order=order,
+                                                   limit=limit, cursor=cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            files_result = page["files"]
+            next_cursor = page["next_cursor"]
+            file_total = page["total_count"]
             
             # Kombinera resultat
             items = []
@@ -418,6 +711,8 @@ def browse(
                     "type": "file",
                     "file_size": file_item.get("size", 0),
                     "file_type": file_item.get("file_type", ""),
+                    "category": file_item.get("category"),
+                    "modified_date": file_item.get("modified_at"),
                     "client": file_item.get("client", ""),
                     "project": file_item.get("project", "")
                 })
@@ -426,19 +721,27 @@ def browse(
             
         else:
             print(f"📄 Using fallback files table method")
-            # Fallback: Använd gamla metoden med files-tabellen
+            # Fallback: lista nivån direkt ur files.path (opaginerad) och bygg
+            # directories i bakgrunden så att nästa anrop går den snabba vägen
             items = browse_directory_fallback(disk_id_int, path)
+            build_directories_in_background(disk_id_int)
+            next_cursor = None
+            file_total = None
         
         # Räkna folder vs files
         folders = [item for item in items if item["type"] == "folder"]
         files = [item for item in items if item["type"] == "file"]
         
-        return {
+        return list_response({
             "items": items,
             "path": path,
             "directory_count": len(folders),
-            "file_count": len(files)
-        }
+            "file_count": len(files),
+            "file_total": file_total,
+            "next_cursor": next_cursor,
+            "sort": sort,
+            "order": order
+        }, "items", BROWSE_ITEM_FIELDS, parse_fields(fields), compact)
         
     except HTTPException:
         raise
@@ -446,41 +749,475 @@ def browse(
         print(f"❌ Browse error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/disks/{disk_identifier}/tree")
+def get_disk_tree(
+    disk_identifier: str,
+    path: Optional[str] = Query(None, description="Startkatalog (tom = roten)"),
+    depth: int = Query(2, ge=1, le=10, description="Antal nivåer under path"),
+    max_nodes: int = Query(2000, ge=1, le=20000, description="Max antal kataloger i svaret")
+):
+    """
+    Katalogträd för förhämtning i filutforskaren - flera nivåer med antal filer
+    och undermappar i ett anrop. Noderna är listor enligt "fields"; kataloger
+    på nivå < depth har alla sina undermappar med.
+    """
+    try:
+        print(f"🌳 Tree: disk={disk_identifier}, path='{path or 'ROOT'}', depth={depth}")
+        
+        # Hitta disk ID
+        disk_id_int = None
+        try:
+            disk_id_int = int(disk_identifier)
+        except ValueError:
+            disk = get_disk_by_name(disk_identifier)
+            if disk:
+                disk_id_int = disk.id
+            else:
+                raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
+        
+        tree = get_directory_tree(disk_id_int, path, depth=depth, max_nodes=max_nodes)
+        if tree is None:
+            raise HTTPException(status_code=404, detail=f"Mappen '{path}' finns inte")
+        if not tree["normalized"]:
+            # Inga katalograder än - bygg dem så att nästa anrop kan svara
+            build_directories_in_background(disk_id_int)
+        
+        print(f"⚡ Tree result: {len(tree['nodes'])} directories, depth {tree['depth']}")
+        return tree
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Tree error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/disks/{disk_identifier}/treemap")
+def get_disk_treemap(
+    disk_identifier: str,
+    path: Optional[str] = Query(None, description="Startkatalog (tom = roten)"),
+    depth: int = Query(2, ge=1, le=5, description="Antal nivåer under path"),
+    limit: int = Query(20, ge=1, le=100, description="Största undermapparna per katalog")
+):
+    """
+    Storleksfördelning under path för treemap/sunburst: nästlade noder med
+    underträdets storlek och antal filer, de största undermapparna per nivå
+    och resten sammanslaget i "other". Läses från summorna som räknas vid import.
+    """
+    try:
+        print(f"🗺️ Treemap: disk={disk_identifier}, path='{path or 'ROOT'}', depth={depth}")
+        
+        # Hitta disk ID
+        disk_id_int = None
+        try:
+            disk_id_int = int(disk_identifier)
+        except ValueError:
+            disk = get_disk_by_name(disk_identifier)
+            if disk:
+                disk_id_int = disk.id
+            else:
+                raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
+        
+        treemap = get_directory_treemap(disk_id_int, path, depth=depth, limit=limit)
+        if treemap is None:
+            raise HTTPException(status_code=404, detail=f"Mappen '{path}' finns inte")
+        if not treemap["normalized"] or treemap["pending"]:
+            # Inga katalograder eller summor än - bygg dem på bulk-poolen så att nästa anrop kan svara
+            build_directories_in_background(disk_id_int)
+        
+        return treemap
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Treemap error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/disks/{disk_identifier}/manifest")
+def get_disk_manifest_endpoint(
+    disk_identifier: str,
+    request: Request,
+    v: Optional[str] = Query(None, description="manifest_version från /disks/{id}")
+):
+    """
+    Hela katalogträdet för en disk (kolumnär JSON, gzip) så att klienten kan
+    visa och söka i mappstrukturen utan fler anrop. Med v=manifest_version
+    cachas svaret som immutable; annars valideras det mot ETag.
+    """
+    try:
+        # Hitta disk ID
+        disk_id_int = None
+        try:
+            disk_id_int = int(disk_identifier)
+        except ValueError:
+            disk = get_disk_by_name(disk_identifier)
+            if disk:
+                disk_id_int = disk.id
+            else:
+                raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
+        
+        manifest = get_disk_manifest(disk_id_int)
+        if manifest is None:
+            build_directories_in_background(disk_id_int)
+            # Bygget sker på bulk-poolen (ett per disk) - inte i GET-anropet
+            raise HTTPException(status_code=404, detail="Manifest saknas - mappstrukturen byggs, försök igen senare")
+        
+        etag = f'"{manifest["version"]}"'
+        headers = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "public, max-age=31536000, immutable" if v == manifest["version"] else "no-cache"
+        }
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            content = manifest["data"]
+        else:
+            content = gzip.decompress(manifest["data"])
+        print(f"🗺️ Manifest: disk={disk_id_int}, {manifest['directory_count']} directories, "
+              f"{len(manifest['data'])} bytes gzip ({manifest['raw_size']} raw)")
+        return Response(content=content, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Manifest error: {e}")
+        raise HTTPException(status_code=500, detail=f"Kunde inte hämta manifest: {str(e)}")
+
+# Exportformat -> (media type, filändelse)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+# En encoder för hela exporten (json.dumps med argument skapar en per anrop)
+_ndjson_encoder = json.JSONEncoder(ensure_ascii=False, default=_export_value)
+
+def export_response(batches, filename: str, export_format: str, compress: bool) -> StreamingResponse:
+    """
+    Strömma batcher av exportrader (EXPORT_COLUMNS) som NDJSON eller CSV,
+    valfritt gzip-komprimerat. Varje batch kodas och skickas för sig så att
+    minnet hålls konstant.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Okänt format '{export_format}' (ndjson eller csv)")
+    media_type, extension = EXPORT_FORMATS[export_format]
+    
+    def encode():
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue().encode("utf-8")
+        rows_written = 0
+        try:
+            for batch in batches:
+                buffer = io.StringIO()
+                if export_format == "csv":
+                    writer = csv.writer(buffer)
+                    writer.writerows([_export_value(value) for value in row] for row in batch)
+                else:
+                    for row in batch:
+                        buffer.write(_ndjson_encoder.encode(dict(zip(EXPORT_COLUMNS, row))))
+                        buffer.write("\n")
+                rows_written += len(batch)
+                yield buffer.getvalue().encode("utf-8")
+        finally:
+            print(f"📤 Export {filename}: {rows_written} rows")
+    
+    def gzip_stream(chunks):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip-format
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    
+    filename = f"{filename}.{extension}"
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        gzip_stream(encode()) if compress else encode(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.get("/disks/{disk_identifier}/export")
+def export_disk_files(
+    disk_identifier: str,
+    format: str = Query("ndjson", description="ndjson eller csv"),
+    compress: bool = Query(False, description="gzip-komprimera filen")
+):
+    """Exportera alla filer på en disk (strömmas, konstant minne oavsett antal)"""
+    try:
+        # Hitta disk
+        disk = None
+        try:
+            disk = get_disk_by_id(int(disk_identifier))
+        except ValueError:
+            disk = get_disk_by_name(disk_identifier)
+        if not disk:
+            raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
+        
+        print(f"📤 Export: disk={disk.id}, format={format}, gzip={compress}")
+        filename = re.sub(r'[^A-Za-z0-9._-]+', '_', disk.name) or f"disk_{disk.id}"
+        return export_response(guarded_export(iter_file_export(disk_id=disk.id)), filename, format, compress)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Export error: {e}")
+        raise HTTPException(status_code=500, detail=f"Kunde inte exportera disk: {str(e)}")
+
+# Fält per träff i /search (för fields=)
+SEARCH_FILE_FIELDS = ("id", "name", "filename", "path", "file_path", "size", "file_size", "file_type",
+                      "category", "client", "project", "keywords", "checksum", "mime_type", "disk_id",
+                      "modified_at", "created_at", "size_formatted", "icon")
+
 @app.get("/search")
-def search_files_endpoint(
+async def search_files_endpoint(
+    request: Request,
     q: str = Query("", description="Sökterm"),
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=1000),
     client: Optional[str] = None,
     project: Optional[str] = None,
     file_type: Optional[str] = None,
-    disk_id: Optional[int] = None
+    disk_id: Optional[int] = None,
+    modified_from: Optional[datetime] = Query(None, description="Ändrad från och med (ISO-datum)"),
+    modified_to: Optional[datetime] = Query(None, description="Ändrad före (ISO-datum)"),
+    size_min: Optional[int] = Query(None, ge=0, description="Minsta storlek i bytes"),
+    size_max: Optional[int] = Query(None, ge=0, description="Största storlek i bytes"),
+    prefix_match: bool = Query(False, description="Matcha kund/projekt som prefix (snabbare) i stället för delsträng"),
+    facets: bool = Query(False, description="Inkludera antal träffar per filtyp, disk, kund och projekt"),
+    facet_limit: int = Query(20, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Kommaseparerade fält per träff, t.ex. id,name,size,path"),
+    compact: bool = Query(False, description="Rader som listor + columns i stället för objekt")
 ):
     """Sök efter filer"""
     try:
         print(f"🔍 Searching for: {q}")
         print(f"   Filters - client: {client}, project: {project}, file_type: {file_type}, disk_id: {disk_id}")
-        
-        results = search_files(
-            query=q,
-            client=client,
-            project=project,
-            file_type=file_type,
-            disk_id=disk_id,
-            limit=per_page
-        )
+        if modified_from or modified_to or size_min is not None or size_max is not None:
+            print(f"   Ranges - modified: {modified_from}..{modified_to}, size: {size_min}..{size_max}")
+        
+        ranges = {
+            "modified_from": modified_from,
+            "modified_to": modified_to,
+            "size_min": size_min,
+            "size_max": size_max,
+            "prefix_match": prefix_match
+        }
+        def run_search():
+            results = search_files(
+                query=q,
+                client=client,
+                project=project,
+                file_type=file_type,
+                disk_id=disk_id,
+                limit=per_page,
+                **ranges
+            )
+            facet_data = get_search_facets(
+                query=q,
+                client=client,
+                project=project,
+                file_type=file_type,
+                disk_id=disk_id,
+                facet_limit=facet_limit,
+                **ranges
+            ) if facets else None
+            return results, facet_data
+        
+        results, facet_data = await run_guarded(request, "search", run_search)
         
         print(f"✅ Found {len(results)} search results")
-        return {
+        response = {
             "files": results,
             "total_count": len(results),
             "page": page,
             "per_page": per_page
         }
+        
+        if facets:
+            response["facets"] = facet_data
+        
+        return list_response(response, "files", SEARCH_FILE_FIELDS, parse_fields(fields), compact)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Search error: {e}")
         raise HTTPException(status_code=500, detail=f"Sökfel: {str(e)}")
 
+@app.get("/search/stream")
+async def search_stream(
+    q: str = Query("", description="Sökterm"),
+    limit: int = Query(200, ge=1, le=1000, description="Max antal träffar totalt"),
+    client: Optional[str] = None,
+    project: Optional[str] = None,
+    file_type: Optional[str] = None,
+    disk_id: Optional[int] = None,
+    modified_from: Optional[datetime] = Query(None, description="Ändrad från och med (ISO-datum)"),
+    modified_to: Optional[datetime] = Query(None, description="Ändrad före (ISO-datum)"),
+    size_min: Optional[int] = Query(None, ge=0, description="Minsta storlek i bytes"),
+    size_max: Optional[int] = Query(None, ge=0, description="Största storlek i bytes"),
+    prefix_match: bool = Query(False, description="Matcha kund/projekt som prefix (snabbare) i stället för delsträng")
+):
+    """
+    Progressiv sökning (Server-Sent Events): en disk i taget, senast använda
+    diskar först (därefter senast importerade). Träffarna skickas så fort en
+    disk är klar och sökningen avbryts när klienten kopplar ned.
+    """
+    disk_ids = await run_in_threadpool(get_disk_ids, disk_id)
+    disk_ids.sort(key=lambda d: disk_last_used.get(d, 0), reverse=True)  # stabil - importordning behålls
+    
+    filters = {
+        "client": client,
+        "project": project,
+        "file_type": file_type,
+        "modified_from": modified_from,
+        "modified_to": modified_to,
+        "size_min": size_min,
+        "size_max": size_max,
+        "prefix_match": prefix_match
+    }
+    print(f"🔍 Streamed search for: {q} ({len(disk_ids)} disks)")
+    
+    async def event_stream():
+        total = 0
+        searched = 0
+        for current_disk_id in disk_ids:
+            if total >= limit:
+                break
+            # Nedkoppling avbryter strömmen (CancelledError) - run_guarded avbryter då frågan
+            try:
+                files = await run_guarded(
+                    None, "search", search_files, q, disk_id=current_disk_id, limit=limit - total, **filters
+                )
+            except asyncio.CancelledError:
+                print(f"🔌 Streamed search '{q}' avbruten efter {searched}/{len(disk_ids)} diskar")
+                raise
+            except HTTPException as e:
+                yield f"data: {json.dumps({'status': 'error', 'message': e.detail})}\n\n"
+                return
+            except Exception as e:
+                print(f"❌ Streamed search error on disk {current_disk_id}: {e}")
+                yield f"data: {json.dumps({'status': 'error', 'message': f'Sökfel: {str(e)}'})}\n\n"
+                return
+            searched += 1
+            total += len(files)
+            yield "data: " + json.dumps({
+                "status": "results",
+                "disk_id": current_disk_id,
+                "files": files,
+                "total_count": total,
+                "disks_searched": searched,
+                "disk_count": len(disk_ids)
+            }) + "\n\n"
+        
+        yield "data: " + json.dumps({
+            "status": "finished",
+            "total_count": total,
+            "disks_searched": searched,
+            "disk_count": len(disk_ids),
+            "limit_reached": total >= limit
+        }) + "\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.get("/search/export")
+def export_search_results(
+    q: str = Query("", description="Sökterm"),
+    client: Optional[str] = None,
+    project: Optional[str] = None,
+    file_type: Optional[str] = None,
+    disk_id: Optional[int] = None,
+    modified_from: Optional[datetime] = Query(None, description="Ändrad från och med (ISO-datum)"),
+    modified_to: Optional[datetime] = Query(None, description="Ändrad före (ISO-datum)"),
+    size_min: Optional[int] = Query(None, ge=0, description="Minsta storlek i bytes"),
+    size_max: Optional[int] = Query(None, ge=0, description="Största storlek i bytes"),
+    prefix_match: bool = Query(False, description="Matcha kund/projekt som prefix (snabbare) i stället för delsträng"),
+    format: str = Query("ndjson", description="ndjson eller csv"),
+    compress: bool = Query(False, description="gzip-komprimera filen")
+):
+    """Exportera alla träffar för en sökning (samma filter som /search, utan sidgräns)"""
+    try:
+        print(f"📤 Search export: '{q}', format={format}, gzip={compress}")
+        batches = iter_file_export(
+            disk_id=disk_id,
+            query=q,
+            client=client,
+            project=project,
+            file_type=file_type,
+            modified_from=modified_from,
+            modified_to=modified_to,
+            size_min=size_min,
+            size_max=size_max,
+            prefix_match=prefix_match
+        )
+        return export_response(guarded_export(batches), "search_export", format, compress)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Search export error: {e}")
+        raise HTTPException(status_code=500, detail=f"Kunde inte exportera sökning: {str(e)}")
+
+@app.get("/stats/date-histogram")
+async def date_histogram_endpoint(
+    request: Request,
+    disk_id: Optional[int] = None,
+    interval: str = Query("month", description="day, week, month, quarter eller year"),
+    field: str = Query("modified", description="modified eller created"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    size_min: Optional[int] = Query(None, ge=0)
+):
+    """Filer och bytes per tidsintervall - globalt eller för en disk"""
+    try:
+        if field not in ("modified", "created"):
+            raise HTTPException(status_code=400, detail="field måste vara 'modified' eller 'created'")
+        return await run_guarded(
+            request, "stats", get_date_histogram,
+            disk_id=disk_id,
+            interval=interval,
+            field=field,
+            date_from=date_from,
+            date_to=date_to,
+            size_min=size_min
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Histogram error: {e}")
+        raise HTTPException(status_code=500, detail=f"Histogram-fel: {str(e)}")
+
+@app.get("/suggest")
+def suggest_endpoint(
+    q: str = Query(..., min_length=1, description="Prefix att komplettera"),
+    kinds: Optional[str] = Query(None, description="Kommaseparerat: file,folder,client,project"),
+    limit: int = Query(10, ge=1, le=20)
+):
+    """Typeahead - vanligaste filnamn, mappnamn, kunder och projekt som börjar med q"""
+    try:
+        kind_list = [k.strip() for k in kinds.split(',') if k.strip()] if kinds else None
+        return suggest(q, kind_list, limit)
+    except Exception as e:
+        print(f"❌ Suggest error: {e}")
+        raise HTTPException(status_code=500, detail=f"Förslagsfel: {str(e)}")
+
 @app.get("/stats")
 def get_stats():
     """Hämta systemstatistik"""
@@ -492,6 +1229,54 @@ def get_stats():
         print(f"❌ Stats error: {e}")
         raise HTTPException(status_code=500, detail=f"Statistik-fel: {str(e)}")
 
+@app.post("/stats/recompute")
+async def recompute_stats_endpoint(request: Request):
+    """Räkna om katalogstatistiken från grunden och kontrollera räknarna (admin)"""
+    try:
+        print("📊 Recomputing catalog stats...")
+        return await run_guarded(request, "maintenance", recompute_catalog_stats)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Stats recompute error: {e}")
+        raise HTTPException(status_code=500, detail=f"Kunde inte räkna om statistik: {str(e)}")
+
+@app.get("/duplicates")
+def get_duplicates_endpoint(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=500),
+    disk_id: Optional[int] = None,
+    confirmed_only: bool = Query(False, description="Bara checksumma-bekräftade grupper"),
+    min_size: int = Query(0, ge=0, description="Minsta filstorlek i bytes"),
+    include_pairs: bool = Query(True, description="Inkludera besparing per diskpar")
+):
+    """Dubbletter mellan diskar, störst besparing först"""
+    try:
+        print(f"🔁 Fetching duplicates: page={page}, disk_id={disk_id}, confirmed_only={confirmed_only}")
+        return get_duplicates(
+            page=page,
+            per_page=per_page,
+            disk_id=disk_id,
+            confirmed_only=confirmed_only,
+            min_size=min_size,
+            include_pairs=include_pairs
+        )
+    except Exception as e:
+        print(f"❌ Duplicates error: {e}")
+        raise HTTPException(status_code=500, detail=f"Dubblett-fel: {str(e)}")
+
+@app.post("/duplicates/rebuild")
+async def rebuild_duplicates_endpoint(request: Request):
+    """Bygg om hela dubblett-tabellen (normalt uppdateras den inkrementellt vid import)"""
+    try:
+        groups = await run_guarded(request, "maintenance", rebuild_duplicates)
+        return {"success": True, "duplicate_groups": groups}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Duplicate rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Kunde inte bygga om dubbletter: {str(e)}")
+
 # === PROGRESS TRACKING ===
 
 class ProgressTracker:
@@ -514,7 +1299,19 @@ class ProgressTracker:
         
         print(f"📈 Progress {self.task_id}: {progress}% - {message}")
 
-def import_disk_with_progress(file_data: bytes, filename: str, task_id: str, replace_existing: bool = False):
+def resolve_path_mapping(scan_info: dict, client_level: Optional[int], project_level: Optional[int]):
+    """Kund/projekt-nivå: uttryckligt angiven vid upload, annars från indexerarens scan_info"""
+    if client_level is None:
+        client_level = scan_info.get('client_level')
+    if project_level is None:
+        project_level = scan_info.get('project_level')
+    for label, level in (("client_level", client_level), ("project_level", project_level)):
+        if level is not None and level < 1:
+            raise ValueError(f"{label} måste vara >= 1")
+    return client_level, project_level
+
+def import_disk_with_progress(file_data: bytes, filename: str, task_id: str, replace_existing: bool = False,
+                              client_level: Optional[int] = None, project_level: Optional[int] = None):
     """Synkron import med progress tracking och replace-stöd"""
     tracker = ProgressTracker(task_id)
     
@@ -589,37 +1386,57 @@ def import_disk_with_progress(file_data: bytes, filename: str, task_id: str, rep
             "replaced_existing": replace_existing
         }
         
-        # Skapa disk
-        disk = add_disk(
-            name=safe_disk_name,
-            disk_metadata=json.dumps(disk_metadata),
-            path=f"/uploads/{filename}",
-            status="imported"
-        )
+        # Kund/projekt från sökvägsnivåer - sätts på filerna i importloopen
+        client_level, project_level = resolve_path_mapping(scan_info, client_level, project_level)
         
         tracker.update_progress("importing", 35, "Importerar filer...", 
             f"Startar import av {total_files} filer")
         
         # Importera filer med progress
-        session = SessionLocal()
+        session = BulkSessionLocal()
         try:
+            # Skapa disk
+            disk = add_disk(
+                name=safe_disk_name,
+                disk_metadata=json.dumps(disk_metadata),
+                path=f"/uploads/{filename}",
+                status="imported",
+                client_level=client_level,
+                project_level=project_level,
+                session=session
+            )
+            
             files_imported = 0
             batch_size = 100
             
+            # Katalogerna skapas först - filerna refererar dem via dir_id
+            dir_ids, new_directories = ensure_directory_ids(
+                session, disk.id, {f.get('file_path', f.get('path', '')) for f in all_files}
+            )
+            # Kund/projekt per katalog (nivåer i sökvägen)
+            dir_mapping = {
+                path: path_mapping_values(path, client_level, project_level) for path in dir_ids
+            } if client_level or project_level else {}
+            
             for i, file_info in enumerate(all_files):
                 try:
+                    dir_path = normalize_directory_path(file_info.get('file_path', file_info.get('path', '')))
+                    client, project = dir_mapping.get(dir_path) or (file_info.get('client'), file_info.get('project'))
                     file_entry = FileEntry(
                         disk_id=disk.id,
                         name=file_info.get('filename', file_info.get('name', '')),
-                        path=file_info.get('file_path', file_info.get('path', '')),
+                        dir_id=dir_ids[dir_path],
                         size=file_info.get('file_size', file_info.get('size', 0)),
                         file_type=file_info.get('extension', '').lstrip('.') 
                             if file_info.get('extension') else None,
-                        client=file_info.get('client'),
-                        project=file_info.get('project'),
+                        category=determine_file_type(file_info.get('extension')),
+                        client=client,
+                        project=project,
                         keywords=file_info.get('keywords'),
                         checksum=file_info.get('checksum', ''),
-                        mime_type=file_info.get('mime_type', '')
+                        mime_type=file_info.get('mime_type', ''),
+                        modified_at=parse_timestamp(file_info.get('modified')),
+                        created_at=parse_timestamp(file_info.get('created'))
                     )
                     session.add(file_entry)
                     files_imported += 1
@@ -634,15 +1451,17 @@ def import_disk_with_progress(file_data: bytes, filename: str, task_id: str, rep
                             f"{((files_imported/total_files)*100):.1f}% klart"
                         )
                     
-                    # Commit i batches för bättre prestanda
+                    # Flush i batches - hela importen är en transaktion
                     if files_imported % batch_size == 0:
-                        session.commit()
+                        session.flush()
                         
                 except Exception as e:
                     print(f"⚠️ Error importing file {file_info.get('filename', file_info.get('name', ''))}: {e}")
                     continue
             
-            # Final commit
+            # Disken, katalogerna och filerna räknas in i katalogstatistiken i
+            # samma commit som gör dem synliga
+            update_catalog_stats_for_disk(session, disk.id, disks=1, directories=new_directories)
             session.commit()
             
             tracker.update_progress("directories", 92, "Skapar mappstruktur...", "Populerar directories")
@@ -650,6 +1469,11 @@ def import_disk_with_progress(file_data: bytes, filename: str, task_id: str, rep
             # Skapa directories
             directories_created = populate_directories_for_disk(disk.id)
             
+            tracker.update_progress("duplicates", 96, "Uppdaterar dubbletter...", "Jämför mot andra diskar")
+            duplicate_groups = refresh_duplicates_for_disk(disk.id)
+            invalidate_search_caches()
+            update_suggest_index_for_disk(disk.id)
+            
             # Slutresultat
             result = {
                 "success": True,
@@ -657,6 +1481,7 @@ def import_disk_with_progress(file_data: bytes, filename: str, task_id: str, rep
                 "disk_name": safe_disk_name,
                 "files_imported": files_imported,
                 "directories_created": directories_created,
+                "duplicate_groups": duplicate_groups,
                 "total_files": total_files,
                 "total_size_mb": round(total_size / (1024*1024), 2),
                 "replaced_existing": replace_existing,
@@ -724,7 +1549,9 @@ def check_duplicate(file: UploadFile = File(...)):
 def upload_json_index_async(
     background_tasks: BackgroundTasks, 
     file: UploadFile = File(...),
-    replace_existing: bool = False  # Ny parameter
+    replace_existing: bool = False,  # Ny parameter
+    client_level: Optional[int] = Query(None, ge=1, description="Sökvägsnivå för kund (default: från indexeraren)"),
+    project_level: Optional[int] = Query(None, ge=1, description="Sökvägsnivå för projekt (default: från indexeraren)")
 ):
     """Async upload endpoint med progress tracking"""
     
@@ -743,7 +1570,9 @@ def upload_json_index_async(
         file_data, 
         file.filename, 
         task_id, 
-        replace_existing  # Skicka vidare parametern
+        replace_existing,  # Skicka vidare parametern
+        client_level,
+        project_level
     )
     
     return {
@@ -820,7 +1649,11 @@ def get_upload_status(task_id: str):
             raise HTTPException(status_code=404, detail="Task inte hittad")
 
 @app.post("/upload/json-index")
-def upload_json_index(file: UploadFile = File(...)):
+def upload_json_index(
+    file: UploadFile = File(...),
+    client_level: Optional[int] = Query(None, ge=1, description="Sökvägsnivå för kund (default: från indexeraren)"),
+    project_level: Optional[int] = Query(None, ge=1, description="Sökvägsnivå för projekt (default: från indexeraren)")
+):
     """Ladda upp och importera JSON-index från SimpleTreeIndexer (synkron version)"""
     print(f"📤 Started processing: {file.filename}")
     
@@ -873,31 +1706,53 @@ def upload_json_index(file: UploadFile = File(...)):
             "original_filename": file.filename
         }
         
-        # Lägg till disk i databasen
-        disk = add_disk(
-            name=safe_disk_name,
-            disk_metadata=json.dumps(disk_metadata),
-            path=f"/uploads/{file.filename}",
-            status="imported"
-        )
+        # Kund/projekt från sökvägsnivåer - sätts på filerna i importloopen
+        client_level, project_level = resolve_path_mapping(scan_info, client_level, project_level)
         
         # Importera filer med progress logging
         print(f"📈 Starting database import: {total_files} files to process")
-        session = SessionLocal()
+        session = BulkSessionLocal()
         try:
+            # Lägg till disk i databasen
+            disk = add_disk(
+                name=safe_disk_name,
+                disk_metadata=json.dumps(disk_metadata),
+                path=f"/uploads/{file.filename}",
+                status="imported",
+                client_level=client_level,
+                project_level=project_level,
+                session=session
+            )
+            
             files_imported = 0
-            batch_size = 100  # Commit i batches för bättre prestanda
+            batch_size = 100  # Flush i batches för bättre prestanda
+            
+            # Katalogerna skapas först - filerna refererar dem via dir_id
+            dir_ids, new_directories = ensure_directory_ids(
+                session, disk.id, {f.get('file_path', f.get('path', '')) for f in all_files}
+            )
+            # Kund/projekt per katalog (nivåer i sökvägen)
+            dir_mapping = {
+                path: path_mapping_values(path, client_level, project_level) for path in dir_ids
+            } if client_level or project_level else {}
             
             for i, file_info in enumerate(all_files):
                 try:
+                    dir_path = normalize_directory_path(file_info.get('file_path', file_info.get('path', '')))
+                    client, project = dir_mapping.get(dir_path) or (file_info.get('client'), file_info.get('project'))
                     file_entry = FileEntry(
                         disk_id=disk.id,
                         name=file_info.get('filename', file_info.get('name', '')),
-                        path=file_info.get('file_path', file_info.get('path', '')),
+                        dir_id=dir_ids[dir_path],
                         size=file_info.get('file_size', file_info.get('size', 0)),
                         file_type=file_info.get('extension', '').lstrip('.') if file_info.get('extension') else None,
+                        category=determine_file_type(file_info.get('extension')),
+                        client=client,
+                        project=project,
                         checksum=file_info.get('checksum', ''),
-                        mime_type=file_info.get('mime_type', '')
+                        mime_type=file_info.get('mime_type', ''),
+                        modified_at=parse_timestamp(file_info.get('modified')),
+                        created_at=parse_timestamp(file_info.get('created'))
                     )
                     session.add(file_entry)
                     files_imported += 1
@@ -907,15 +1762,17 @@ def upload_json_index(file: UploadFile = File(...)):
                         progress_percent = (files_imported / total_files) * 100
                         print(f"📈 Progress: {progress_percent:.1f}% ({files_imported}/{total_files} files)")
                         
-                    # Commit i batches för bättre prestanda
+                    # Flush i batches - hela importen är en transaktion
                     if files_imported % batch_size == 0:
-                        session.commit()
+                        session.flush()
                         
                 except Exception as e:
                     print(f"⚠️ Error importing file {file_info.get('filename', file_info.get('name', ''))}: {e}")
                     continue
             
-            # Final commit
+            # Disken, katalogerna och filerna räknas in i katalogstatistiken i
+            # samma commit som gör dem synliga
+            update_catalog_stats_for_disk(session, disk.id, disks=1, directories=new_directories)
             session.commit()
             
             # Populera directories-tabellen
@@ -923,6 +1780,11 @@ def upload_json_index(file: UploadFile = File(...)):
             directories_created = populate_directories_for_disk(disk.id)
             print(f"✅ Created {directories_created} directory entries")
             
+            duplicate_groups = refresh_duplicates_for_disk(disk.id)
+            print(f"🔁 {duplicate_groups} duplicate groups touch this disk")
+            invalidate_search_caches()
+            update_suggest_index_for_disk(disk.id)
+            
         except Exception as e:
             session.rollback()
             raise e
@@ -937,6 +1799,7 @@ def upload_json_index(file: UploadFile = File(...)):
             "disk_name": safe_disk_name,
             "files_imported": files_imported,
             "directories_created": directories_created,
+            "duplicate_groups": duplicate_groups,
             "total_files": total_files,
             "total_size_mb": round(total_size / (1024*1024), 2),
             "message": f"Hårddisk {safe_disk_name} importerad framgångsrikt"
@@ -949,6 +1812,36 @@ def upload_json_index(file: UploadFile = File(...)):
         print(f"❌ Import error: {e}")
         raise HTTPException(status_code=500, detail=f"Import-fel: {str(e)}")
 
+@app.put("/disks/{disk_identifier}/path-mapping")
+def set_path_mapping_endpoint(
+    disk_identifier: str,
+    client_level: Optional[int] = Query(None, ge=1, description="Sökvägsnivå för kund (1 = första mappen)"),
+    project_level: Optional[int] = Query(None, ge=1, description="Sökvägsnivå för projekt")
+):
+    """Ändra vilken sökvägsnivå som är kund resp. projekt och räkna om disken"""
+    try:
+        disk = None
+        try:
+            disk = get_disk_by_id(int(disk_identifier))
+        except ValueError:
+            disk = get_disk_by_name(disk_identifier)
+        if not disk:
+            raise HTTPException(status_code=404, detail=f"Disk '{disk_identifier}' inte hittad")
+        
+        updated = set_disk_path_mapping(disk.id, client_level, project_level)
+        return {
+            "success": True,
+            "disk_id": disk.id,
+            "client_level": client_level,
+            "project_level": project_level,
+            "files_updated": updated
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Path mapping error: {e}")
+        raise HTTPException(status_code=500, detail=f"Kunde inte ändra mappning: {str(e)}")
+
 @app.delete("/disks/{disk_name}")
 def delete_disk_endpoint(disk_name: str):
     """Ta bort en disk"""
@@ -982,7 +1875,8 @@ def debug_disk_data(disk_identifier: str):
             # Files count och sample
             files_count = session.query(FileEntry).filter(FileEntry.disk_id == disk.id).count()
             
-            sample_files = session.query(FileEntry).filter(FileEntry.disk_id == disk.id).order_by(FileEntry.path, FileEntry.name).limit(10).all()
+            sample_files = query_files_with_path(session).filter(FileEntry.disk_id == disk.id) \
+                .order_by(FILE_DIR_PATH, FileEntry.name).limit(10).all()
             
             # Directories count och sample
             directories_count = session.query(DirectoryEntry).filter(DirectoryEntry.disk_id == disk.id).count()
@@ -990,11 +1884,10 @@ def debug_disk_data(disk_identifier: str):
             sample_directories = session.query(DirectoryEntry).filter(DirectoryEntry.disk_id == disk.id).limit(10).all()
             
             # Unique file paths för analys
-            unique_paths_result = session.query(FileEntry.path).filter(
+            unique_paths_result = query_files_with_path(session, FileEntry.disk_id).filter(
                 FileEntry.disk_id == disk.id,
-                FileEntry.path.isnot(None),
-                FileEntry.path != ''
-            ).distinct().order_by(FileEntry.path).limit(20).all()
+                FILE_DIR_PATH != ''
+            ).with_entities(FILE_DIR_PATH).distinct().order_by(FILE_DIR_PATH).limit(20).all()
             
             unique_paths = [row[0] for row in unique_paths_result]
             
@@ -1010,8 +1903,8 @@ def debug_disk_data(disk_identifier: str):
                 "files_count": files_count,
                 "directories_count": directories_count,
                 "sample_files": [
-                    {"filename": f.name, "file_path": f.path, "file_size": f.size} 
-                    for f in sample_files
+                    {"filename": f.name, "file_path": dir_path, "file_size": f.size} 
+                    for f, dir_path in sample_files
                 ],
                 "sample_directories": [
                     {"directory_path": d.path} 
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Uppgradera en befintlig katalog till aktuellt schema.
+
+Körs mot samma databas som API:t (DB_URL), gärna medan appen är igång:
+
+    python migrate.py                         # alla steg som behövs
+    python migrate.py --step directories      # bara ett steg (kan upprepas)
+    python migrate.py --step categories --disk 3
+    python migrate.py --status                # vad som gjorts hittills
+
+Avbryts körningen fortsätter nästa körning där den slutade.
+"""
+
+import argparse
+import sys
+
+from database.migrations import STEP_NAMES, MigrationAlreadyRunning, migration_status, run_migrations
+
+
+def print_status():
+    for row in migration_status():
+        if row['per_disk']:
+            progress = f"{row['disks_done']}/{row['disk_count']} diskar"
+        else:
+            progress = "klar" if row['finished_at'] else "-"
+        print(f"{row['step']:<14} {progress:<16} {row['rows']:>12} rader "
+              f"{row['seconds']:>9.1f}s  {row['finished_at'] or ''}")
+        print(f"{'':<14} {row['description']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Återupptagbar migrering av katalogdatabasen")
+    parser.add_argument('--step', action='append', choices=STEP_NAMES,
+                        help="Kör bara detta steg (kan anges flera gånger)")
+    parser.add_argument('--disk', type=int, help="Begränsa per-disk-steg till en disk (id)")
+    parser.add_argument('--status', action='store_true', help="Visa genomförda steg och avsluta")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return 0
+
+    print("🔧 Migrerar katalogdatabasen...")
+    try:
+        run_migrations(steps=args.step, disk_id=args.disk)
+    except MigrationAlreadyRunning as e:
+        print(f"❌ {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("⏸️ Avbruten - kör igen för att fortsätta")
+        return 130
+    print("✅ Migreringen klar")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
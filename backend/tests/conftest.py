@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Testerna importerar backend-modulerna som appen gör (database.db_manager, main)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Databastesterna körs bara mot en uttryckligen angiven testdatabas
+if os.getenv("TEST_DB_URL"):
+    os.environ["DB_URL"] = os.environ["TEST_DB_URL"]
@@ -0,0 +1,139 @@
+"""
+Keyset-paginering av mapplistningen (get_files_in_directory_page).
+
+Cursor-testerna kör utan databas. Pagineringstesterna kräver en Postgres i
+TEST_DB_URL; de lägger till en egen disk och tar bort den efteråt.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db_manager as db
+
+SORTS = list(db.FILE_SORT_COLUMNS)
+ORDERS = ['asc', 'desc']
+
+
+# === Cursor ===
+
+@pytest.mark.parametrize("sort,value", [
+    ('name', 'b.jpg'), ('size', 2 ** 40), ('type', 'jpg'), ('modified', datetime(2024, 5, 1, 12, 30)),
+])
+@pytest.mark.parametrize("order", ORDERS)
+def test_cursor_round_trip(sort, value, order):
+    cursor = db._encode_cursor(sort, order, 'value', value, 42)
+    assert db._decode_cursor(cursor, sort, order) == ('value', value, 42)
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("order", ORDERS)
+def test_cursor_round_trip_null_segment(sort, order):
+    cursor = db._encode_cursor(sort, order, 'null', None, 7)
+    assert db._decode_cursor(cursor, sort, order) == ('null', None, 7)
+
+
+@pytest.mark.parametrize("sort,order", [('size', 'asc'), ('name', 'desc'), ('modified', 'asc')])
+def test_cursor_from_other_sort_or_order_is_rejected(sort, order):
+    cursor = db._encode_cursor('name', 'asc', 'value', 'b.jpg', 42)
+    with pytest.raises(ValueError, match="sort=name, order=asc"):
+        db._decode_cursor(cursor, sort, order)
+
+
+@pytest.mark.parametrize("payload", [
+    ['size', 'asc', 'value', 'b.jpg', 1],     # fel typ på värdet
+    ['size', 'asc', 'value', True, 1],
+    ['size', 'asc', 'null', 5, 1],            # NULL-segment med värde
+    ['size', 'asc', 'value', None, 1],
+    ['size', 'asc', 'other', 5, 1],
+    ['size', 'asc', 'value', 5, '1'],
+    ['size', 'asc', 'value', 5],
+])
+def test_malformed_cursor_is_rejected(payload):
+    cursor = db.base64.urlsafe_b64encode(db.json.dumps(payload).encode()).decode()
+    with pytest.raises(ValueError):
+        db._decode_cursor(cursor, 'size', 'asc')
+
+
+@pytest.mark.parametrize("cursor", ["", "inte-base64!", "bm90IGpzb24"])
+def test_garbage_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Ogiltig cursor"):
+        db._decode_cursor(cursor, 'name', 'asc')
+
+
+def test_bad_modified_value_is_rejected():
+    cursor = db._encode_cursor('modified', 'asc', 'value', 'inte ett datum', 1)
+    with pytest.raises(ValueError):
+        db._decode_cursor(cursor, 'modified', 'asc')
+
+
+# === Paginering mot databasen ===
+
+needs_db = pytest.mark.skipif(not os.getenv("TEST_DB_URL"), reason="TEST_DB_URL saknas")
+
+
+@pytest.fixture(scope="module")
+def disk():
+    """En disk med 13 filer i 'A': dubbletter och NULL i varje sorteringskolumn"""
+    db.init_db()
+    name = f"cursor-test-{uuid.uuid4().hex[:8]}"
+    disk = db.add_disk(name, '{}', '/test')
+    base = datetime(2024, 1, 1)
+    session = db.BulkSessionLocal()
+    try:
+        for i in range(13):
+            session.add(db.FileEntry(
+                disk_id=disk.id,
+                path='A',
+                name=f"f{i % 5}.dat",
+                size=None if i % 4 == 0 else (i % 3) * 100,
+                file_type=None if i % 3 == 0 else ('jpg', 'mov')[i % 2],
+                modified_at=None if i % 2 == 0 else base + timedelta(days=i % 3),
+            ))
+        session.commit()
+    finally:
+        session.close()
+    db.populate_directories_for_disk(disk.id)
+    yield disk
+    db.delete_disk(name)
+
+
+def _all_pages(disk_id, sort, order, limit):
+    files, cursor = [], None
+    while True:
+        page = db.get_files_in_directory_page(disk_id, 'A', sort=sort, order=order,
+                                              limit=limit, cursor=cursor)
+        files.extend(page['files'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return files
+        assert len(page['files']) == limit
+
+
+@needs_db
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 13, 50])
+def test_pages_match_unpaginated_listing(disk, sort, order, limit):
+    expected = db.get_files_in_directory_page(disk.id, 'A', sort=sort, order=order)['files']
+    assert len(expected) == 13
+    assert [f['id'] for f in _all_pages(disk.id, sort, order, limit)] == [f['id'] for f in expected]
+
+
+@needs_db
+@pytest.mark.parametrize("order", ORDERS)
+def test_null_segment_position(disk, order):
+    files = db.get_files_in_directory_page(disk.id, 'A', sort='modified', order=order)['files']
+    nulls = [f['modified_at'] is None for f in files]
+    # NULL sist vid stigande, först vid fallande - som i indexet
+    assert nulls == sorted(nulls, reverse=(order == 'desc'))
+
+
+@needs_db
+def test_cursor_with_changed_sort_is_rejected(disk):
+    page = db.get_files_in_directory_page(disk.id, 'A', sort='name', order='asc', limit=2)
+    with pytest.raises(ValueError):
+        db.get_files_in_directory_page(disk.id, 'A', sort='size', order='asc', limit=2,
+                                       cursor=page['next_cursor'])
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
 import {
   Text,
@@ -33,6 +33,7 @@ import {
   DialogActions,
   DialogBody,
   Divider,
+  SearchBox,
 } from '@fluentui/react-components';
 import {
   Storage20Regular,
@@ -52,7 +53,7 @@ import {
   Shield20Regular,
   Dismiss20Regular,
 } from '@fluentui/react-icons';
-import { fetchDisk, browseDirectory } from '../../utils/api';
+import { fetchDisk, browseDirectory, fetchDirectoryTree, fetchDiskManifest } from '../../utils/api';
 
 const useStyles = makeStyles({
   container: {
@@ -332,11 +333,19 @@ const FileExplorer = () => {
   const location = useLocation();
   const [disk, setDisk] = useState(null);
   const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [fileTotal, setFileTotal] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [isMobile, setIsMobile] = useState(false);
   const [selectedFile, setSelectedFile] = useState(null);
   const [showFileDialog, setShowFileDialog] = useState(false);
+  // Förhämtade mappar per sökväg (från /tree) så att nästa nivå visas direkt
+  const folderCache = useRef(new Map());
+  // Alla mappsökvägar från diskens manifest - när det finns behövs ingen förhämtning
+  const [manifestPaths, setManifestPaths] = useState(null);
+  const [folderQuery, setFolderQuery] = useState('');
 
   // Extract current path from URL
   const currentPath = location.pathname.includes('/browse/') 
@@ -354,6 +363,12 @@ const FileExplorer = () => {
     return () => window.removeEventListener('resize', checkMobile);
   }, []);
 
+  useEffect(() => {
+    folderCache.current = new Map();
+    setManifestPaths(null);
+    setFolderQuery('');
+  }, [diskId]);
+
   useEffect(() => {
     if (diskId) {
       fetchDiskInfo();
@@ -365,26 +380,134 @@ const FileExplorer = () => {
     try {
       const data = await fetchDisk(diskId);
       setDisk(data);
+      if (data.manifest_version && !manifestPaths) {
+        loadManifest(data.manifest_version);
+      }
     } catch (err) {
       setError(`Kunde inte hämta disk info: ${err.message}`);
     }
   };
 
+  // Hela mappträdet i ett anrop (kolumnärt: parent är radindex, föräldern först)
+  const loadManifest = async (version) => {
+    try {
+      const manifest = await fetchDiskManifest(diskId, version);
+      const paths = new Array(manifest.name.length);
+      const children = manifest.name.map(() => []);
+      
+      manifest.name.forEach((name, index) => {
+        const parent = manifest.parent[index];
+        if (parent < 0) {
+          paths[index] = '';
+          return;
+        }
+        paths[index] = paths[parent] ? `${paths[parent]}/${name}` : name;
+        children[parent].push(index);
+      });
+      
+      children.forEach((childIndexes, index) => {
+        folderCache.current.set(paths[index], childIndexes.map(child => ({
+          filename: manifest.name[child],
+          type: 'folder',
+          file_size: null,
+          file_count: manifest.file_count[child],
+          subdirectory_count: children[child].length,
+          path: paths[child]
+        })));
+      });
+      setManifestPaths(paths.filter(Boolean));
+    } catch (err) {
+      // Utan manifest används /tree-förhämtningen
+      console.warn('Kunde inte läsa diskens manifest:', err.message);
+    }
+  };
+
+  // Hämta mapparna några nivåer ned i bakgrunden medan användaren läser
+  const prefetchTree = async (path) => {
+    try {
+      const tree = await fetchDirectoryTree(diskId, path || null, { depth: 2 });
+      const levels = new Map();
+      const paths = new Map();
+      const children = new Map();
+      
+      // Noderna kommer nivå för nivå, föräldern alltid före barnen
+      for (const [id, parentId, name, fileCount, subdirectoryCount] of tree.nodes || []) {
+        if (parentId === null) {
+          levels.set(id, 0);
+          paths.set(id, tree.path);
+          children.set(id, []);
+          continue;
+        }
+        const parentPath = paths.get(parentId);
+        const folderPath = parentPath ? `${parentPath}/${name}` : name;
+        levels.set(id, levels.get(parentId) + 1);
+        paths.set(id, folderPath);
+        children.set(id, []);
+        children.get(parentId).push({
+          filename: name,
+          type: 'folder',
+          file_size: null,
+          file_count: fileCount,
+          subdirectory_count: subdirectoryCount,
+          path: folderPath
+        });
+      }
+      
+      // Bara nivåer ovanför tree.depth har alla sina undermappar med
+      for (const [id, folders] of children) {
+        if (levels.get(id) < tree.depth) {
+          folderCache.current.set(paths.get(id), folders);
+        }
+      }
+    } catch (err) {
+      // Förhämtning är bara en optimering - browse hämtar ändå allt
+      console.warn('Förhämtning av katalogträd misslyckades:', err.message);
+    }
+  };
+
   const fetchDirectoryContents = async () => {
     setLoading(true);
     setError('');
     
+    // Visa förhämtade mappar direkt medan filerna hämtas
+    const cachedFolders = folderCache.current.get(currentPath);
+    if (cachedFolders) {
+      setItems(cachedFolders);
+      setNextCursor(null);
+      setFileTotal(null);
+      setLoading(false);
+    }
+    
     try {
       const data = await browseDirectory(diskId, currentPath || null);
       setItems(data.items || []);
+      setNextCursor(data.next_cursor || null);
+      setFileTotal(data.file_total ?? null);
+      if (!manifestPaths) prefetchTree(currentPath);
     } catch (err) {
       setError(`Kunde inte hämta kataloginnehåll: ${err.message}`);
       setItems([]);
+      setNextCursor(null);
+      setFileTotal(null);
     }
     
     setLoading(false);
   };
 
+  // Stora mappar hämtas en sida i taget från servern
+  const fetchMoreFiles = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await browseDirectory(diskId, currentPath || null, { cursor: nextCursor });
+      setItems(prev => [...prev, ...(data.items || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      setError(`Kunde inte hämta fler filer: ${err.message}`);
+    }
+    setLoadingMore(false);
+  };
+
   const handleItemClick = (item) => {
     if (item.type === 'folder') {
       const newPath = currentPath ? `${currentPath}/${item.filename}` : item.filename;
@@ -631,6 +754,14 @@ const FileExplorer = () => {
 
   const folders = items.filter(item => item.type === 'folder');
   const files = items.filter(item => item.type === 'file');
+  
+  // Mappsökning lokalt i manifestet (mappnamnet, inte hela sökvägen)
+  const folderMatches = manifestPaths && folderQuery.trim().length >= 2
+    ? manifestPaths.filter(path => {
+        const name = path.slice(path.lastIndexOf('/') + 1).toLowerCase();
+        return name.includes(folderQuery.trim().toLowerCase());
+      }).slice(0, 50)
+    : [];
 
   return (
     <div className={styles.container}>
@@ -722,14 +853,43 @@ const FileExplorer = () => {
             {folders.length} mappar
           </Badge>
           <Badge appearance="filled" color="success" size={isMobile ? "medium" : "small"}>
-            {files.length} filer
+            {fileTotal !== null && fileTotal > files.length
+              ? `${files.length} av ${fileTotal.toLocaleString()} filer`
+              : `${files.length} filer`}
           </Badge>
           {disk?.actual_file_count && (
             <Badge appearance="tint" size={isMobile ? "medium" : "small"}>
               Total: {disk.actual_file_count.toLocaleString()}
             </Badge>
           )}
+          {manifestPaths && (
+            <SearchBox
+              placeholder="Sök mapp på disken..."
+              value={folderQuery}
+              onChange={(e, data) => setFolderQuery(data.value)}
+              size="small"
+            />
+          )}
         </div>
+        
+        {/* Mappsökning (från manifestet, utan API-anrop) */}
+        {folderMatches.length > 0 && (
+          <Card>
+            {folderMatches.map(path => (
+              <div
+                key={path}
+                style={{ display: 'flex', alignItems: 'center', gap: '8px', cursor: 'pointer', padding: '4px 0' }}
+                onClick={() => {
+                  setFolderQuery('');
+                  handlePathNavigation(path);
+                }}
+              >
+                <Folder20Regular style={{ color: tokens.colorPaletteBlueForeground1 }} />
+                <Text>{path}</Text>
+              </div>
+            ))}
+          </Card>
+        )}
       </div>
 
       {/* Content */}
@@ -825,6 +985,14 @@ const FileExplorer = () => {
                 </DataGridBody>
               </DataGrid>
             </div>
+
+            {nextCursor && (
+              <div style={{ display: 'flex', justifyContent: 'center', padding: '16px' }}>
+                <Button appearance="secondary" onClick={fetchMoreFiles} disabled={loadingMore}>
+                  {loadingMore ? <Spinner size="tiny" /> : 'Visa fler filer'}
+                </Button>
+              </div>
+            )}
           </>
         )}
       </div>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useSearchParams, useNavigate } from 'react-router-dom';
 import {
   Text,
@@ -32,7 +32,7 @@ import {
   ChevronRight20Regular,
 } from '@fluentui/react-icons';
 
-import { fetchDisks as getDisks, searchFiles } from '../../utils/api';
+import { fetchDisks as getDisks, streamSearch } from '../../utils/api';
 
 const useStyles = makeStyles({
   container: {
@@ -260,6 +260,9 @@ const Search = () => {
   const [hasSearched, setHasSearched] = useState(false);
   const [disks, setDisks] = useState([]);
   const [isMobile, setIsMobile] = useState(false);
+  // Pågående strömmad sökning (stängs vid ny sökning och när sidan lämnas)
+  const searchStream = useRef(null);
+  const [searchProgress, setSearchProgress] = useState(null);
 
   // Detect mobile
   useEffect(() => {
@@ -304,26 +307,41 @@ const Search = () => {
       return;
     }
 
+    searchStream.current?.close();
     setLoading(true);
     setError('');
     setHasSearched(true);
+    setResults([]);
+    setSearchProgress(null);
 
-    try {
-      const data = await searchFiles({
-        q: searchQuery.trim(),
-        per_page: 200,
-        client: clientFilter || null,
-        project: projectFilter || null,
-        disk_id: diskFilter || null
-      });
-      setResults(data.files || []);
-    } catch (err) {
-      setError(err.message);
-      setResults([]);
-    }
-    setLoading(false);
+    // Träffarna visas disk för disk medan sökningen pågår
+    searchStream.current = streamSearch({
+      q: searchQuery.trim(),
+      limit: 200,
+      client: clientFilter || null,
+      project: projectFilter || null,
+      disk_id: diskFilter || null
+    }, {
+      onResults: (data) => {
+        if (data.files.length > 0) {
+          setResults(prev => [...prev, ...data.files]);
+        }
+        setSearchProgress({ searched: data.disks_searched, total: data.disk_count });
+      },
+      onFinished: () => {
+        setSearchProgress(null);
+        setLoading(false);
+      },
+      onError: (err) => {
+        setError(err.message);
+        setSearchProgress(null);
+        setLoading(false);
+      }
+    });
   };
 
+  useEffect(() => () => searchStream.current?.close(), []);
+
   const handleSearch = () => {
     if (query.trim()) {
       setSearchParams({ q: query.trim() });
@@ -566,7 +584,7 @@ const Search = () => {
 
       {/* Results */}
       <div className={styles.results}>
-        {loading && (
+        {loading && results.length === 0 && (
           <div className={styles.loading}>
             <Spinner label={`Söker efter "${query}"...`} size="large" />
           </div>
@@ -580,7 +598,7 @@ const Search = () => {
           </div>
         )}
 
-        {!loading && !error && hasSearched && (
+        {(!loading || results.length > 0) && !error && hasSearched && (
           <>
             {/* Search Stats */}
             <div className={styles.stats}>
@@ -589,6 +607,7 @@ const Search = () => {
                   ? `${results.length.toLocaleString()} resultat för "${query}"`
                   : `Inga resultat för "${query}"`
                 }
+                {searchProgress && ` (söker... ${searchProgress.searched}/${searchProgress.total} diskar)`}
               </Text>
               {(clientFilter || projectFilter || diskFilter) && (
                 <Text size={200}>
@@ -164,9 +164,11 @@ export const fetchDiskFiles = async (diskId, { page = 1, per_page = 100, path =
 /**
  * Browse directory (ny snabb metod)
  */
-export const browseDirectory = async (diskId, path = null) => {
+export const browseDirectory = async (diskId, path = null, { sort = 'name', order = 'asc', limit = 500, cursor = null } = {}) => {
   try {
-    const params = path ? { path } : {};
+    const params = { sort, order, limit };
+    if (path) params.path = path;
+    if (cursor) params.cursor = cursor;
     
     console.log('🗂️ Browsing directory:', diskId, 'path:', path || 'ROOT');
     const response = await api.get(`/disks/${diskId}/browse`, { params });
@@ -178,6 +180,51 @@ export const browseDirectory = async (diskId, path = null) => {
   }
 };
 
+/**
+ * Hämta katalogträd (flera nivåer) för förhämtning i filutforskaren
+ */
+export const fetchDirectoryTree = async (diskId, path = null, { depth = 2, maxNodes = 2000 } = {}) => {
+  try {
+    const params = { depth, max_nodes: maxNodes };
+    if (path) params.path = path;
+    
+    const response = await api.get(`/disks/${diskId}/tree`, { params });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Failed to fetch directory tree:', diskId, path, error.message);
+    throw new Error(`Kunde inte hämta katalogträd: ${error.message}`);
+  }
+};
+
+/**
+ * Hämta storleksfördelning (underträdets storlek per mapp) för treemap/sunburst
+ */
+export const fetchDiskTreemap = async (diskId, path = null, { depth = 2, limit = 20 } = {}) => {
+  try {
+    const params = { depth, limit };
+    if (path) params.path = path;
+
+    const response = await api.get(`/disks/${diskId}/treemap`, { params });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Failed to fetch disk treemap:', diskId, path, error.message);
+    throw new Error(`Kunde inte hämta storleksfördelning: ${error.message}`);
+  }
+};
+
+/**
+ * Hämta hela katalogträdet för en disk (gzip, cachas som immutable per version)
+ */
+export const fetchDiskManifest = async (diskId, version) => {
+  try {
+    const response = await api.get(`/disks/${diskId}/manifest`, { params: { v: version } });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Failed to fetch disk manifest:', diskId, error.message);
+    throw new Error(`Kunde inte hämta katalogträd: ${error.message}`);
+  }
+};
+
 /**
  * Sök efter filer
  */
@@ -188,7 +235,8 @@ export const searchFiles = async ({
   client = null,
   project = null,
   file_type = null,
-  disk_id = null
+  disk_id = null,
+  facets = false
 } = {}) => {
   try {
     const params = { q, page, per_page };
@@ -196,6 +244,7 @@ export const searchFiles = async ({
     if (project) params.project = project;
     if (file_type) params.file_type = file_type;
     if (disk_id) params.disk_id = disk_id;
+    if (facets) params.facets = true;
     
     console.log('🔍 Searching files:', params);
     const response = await api.get('/search', { params });
@@ -207,6 +256,55 @@ export const searchFiles = async ({
   }
 };
 
+/**
+ * Progressiv sökning via Server-Sent Events - träffarna kommer disk för disk.
+ * Returnerar EventSource; close() avbryter sökningen på servern.
+ */
+export const streamSearch = ({
+  q,
+  limit = 200,
+  client = null,
+  project = null,
+  file_type = null,
+  disk_id = null
+} = {}, { onResults, onFinished, onError } = {}) => {
+  const params = new URLSearchParams({ q, limit });
+  if (client) params.set('client', client);
+  if (project) params.set('project', project);
+  if (file_type) params.set('file_type', file_type);
+  if (disk_id) params.set('disk_id', disk_id);
+  
+  console.log('🔍 Streaming search:', q);
+  const eventSource = new EventSource(`${API_BASE}/search/stream?${params.toString()}`);
+  
+  eventSource.onmessage = (event) => {
+    try {
+      const data = JSON.parse(event.data);
+      if (data.status === 'results') {
+        if (onResults) onResults(data);
+      } else if (data.status === 'finished') {
+        console.log('✅ Streamed search completed:', data.total_count, 'results');
+        eventSource.close();
+        if (onFinished) onFinished(data);
+      } else if (data.status === 'error') {
+        eventSource.close();
+        if (onError) onError(new Error(data.message));
+      }
+    } catch (err) {
+      console.error('❌ Error parsing search stream:', err);
+      eventSource.close();
+      if (onError) onError(err);
+    }
+  };
+  
+  eventSource.onerror = () => {
+    eventSource.close();
+    if (onError) onError(new Error('Anslutningsfel under sökning'));
+  };
+  
+  return eventSource;
+};
+
 /**
  * Hämta systemstatistik
  */
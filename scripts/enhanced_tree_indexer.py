@@ -9,6 +9,7 @@ UPDATERAD v3.0.0: KATASYMBOL EDITION - Native 203 DPI för pixel-perfekt skärpa
 import os
 import json
 import argparse
+import hashlib
 import pickle
 from datetime import datetime
 from pathlib import Path
@@ -16,7 +17,14 @@ from typing import Dict, List, Tuple
 import re
 import sys
 import math
+import time
+import threading
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Filkategorier från samma registry som backend använder vid import
+# (scripts/file_categories.py är en symlänk till backend/database/file_categories.py)
+from file_categories import determine_file_type as registry_file_type
 
 # För QR-kod och label-generering
 try:
@@ -200,72 +208,225 @@ def render_wrapped_list(items, full_width, max_height, start_x, start_y, qr_box,
         if current_y > start_y + max_height:
             break
 
+class FileRecord:
+    """
+    Kompakt fil-post under scanning (v3.1.0).
+
+    Sökvägar (absolut, relativ, föräldermapp) härleds från mapp-noden och byggs
+    först när JSON skrivs. Tidsstämplar sparas som floats istället för ISO-strängar.
+    Inode (för läsordning) och checksumma fylls bara i när hashning är på.
+    """
+    __slots__ = ('name', 'extension', 'size', 'type', 'mtime', 'ctime', 'inode', 'checksum')
+
+    def __init__(self, name: str, extension: str, size: int, file_type: str,
+                 mtime: float, ctime: float, inode: int = None):
+        self.name = name
+        self.extension = sys.intern(extension)
+        self.size = size
+        self.type = sys.intern(file_type)
+        self.mtime = mtime
+        self.ctime = ctime
+        self.inode = inode
+        self.checksum = None
+
+    def to_dict(self, dir_path: str, relative_dir_path: str) -> Dict:
+        """Bygg JSON-formen (samma fält som tidigare versioner, plus checksum om hashad)"""
+        data = {
+            'name': self.name,
+            'path': os.path.join(dir_path, self.name),
+            'relative_path': f"{relative_dir_path}/{self.name}" if relative_dir_path else self.name,
+            'parent_directory': relative_dir_path,
+            'extension': self.extension,
+            'size': self.size,
+            'type': self.type,
+            'modified': datetime.fromtimestamp(self.mtime).isoformat(),
+            'created': datetime.fromtimestamp(self.ctime).isoformat()
+        }
+        # Checkpoints från v3.4.0 saknar de nya slottarna
+        checksum = getattr(self, 'checksum', None)
+        if checksum:
+            data['checksum'] = checksum
+        return data
+
+
+class DirNode:
+    """
+    Kompakt mapp-nod under scanning (v3.1.0).
+
+    Ersätter den tidigare dict-noden (tio nycklar + metadata-dict). Namn internas,
+    barn-dict och fillista skapas först när de behövs och sökvägar räknas fram
+    via föräldrakedjan när de efterfrågas.
+    """
+    __slots__ = ('name', 'parent', 'depth', 'children', 'files',
+                 'file_count', 'subdirectory_count', 'total_size')
+
+    def __init__(self, name: str, parent: 'DirNode' = None, depth: int = 0):
+        self.name = sys.intern(name)
+        self.parent = parent
+        self.depth = depth
+        self.children = None  # Dict[str, DirNode], skapas vid första barnet
+        self.files = None  # List[FileRecord], skapas vid första filen
+        self.file_count = 0
+        self.subdirectory_count = 0
+        self.total_size = 0
+
+    def add_child(self, name: str) -> 'DirNode':
+        child = DirNode(name, self, self.depth + 1)
+        if self.children is None:
+            self.children = {}
+        self.children[child.name] = child
+        self.subdirectory_count += 1
+        return child
+
+    def add_file(self, record: FileRecord):
+        if self.files is None:
+            self.files = []
+        self.files.append(record)
+        self.file_count += 1
+
+    def iter_children(self):
+        return iter(self.children.values()) if self.children else iter(())
+
+    def child_names(self) -> List[str]:
+        return list(self.children.keys()) if self.children else []
+
+    @property
+    def relative_path(self) -> str:
+        """Relativ sökväg från root, byggd lazy via föräldrakedjan"""
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return '/'.join(reversed(parts))
+
+    def metadata_dict(self) -> Dict:
+        return {
+            'depth': self.depth,
+            'file_count': self.file_count,
+            'subdirectory_count': self.subdirectory_count,
+            'total_size': self.total_size
+        }
+
+
+class ScanFilterPlan:
+    """
+    Kompilerad filterplan för en scanning (v3.2.0).
+
+    Hela filterkonfigurationen kompileras en gång: root-mappnamn som frozenset,
+    alla exclude-mönster som ETT kombinerat regex (med namngivna grupper så att
+    träffen kan härledas till sin regel), och extensions som hash-set.
+    Varje träff räknas per regel i `hits` (hamnar i statistics['filter_hits']).
+    """
+
+    # Problematiska mappar direkt under root (nivå 0/1)
+    EXCLUDED_ROOT_FOLDERS = frozenset({
+        'Backups.backupdb',
+        '.Spotlight-V100',
+        '.TemporaryItems',
+        '.Trashes',
+        '.fseventsd'
+    })
+
+    def __init__(self, include_extensions: List[str], exclude_patterns: List[str]):
+        self.include_extensions = (
+            frozenset(ext.lower() for ext in include_extensions) if include_extensions else None
+        )
+        self.exclude_patterns = list(exclude_patterns or [])
+        self.hits = {}
+
+        # Försök slå ihop alla mönster till ett regex. Mönster med numrerade
+        # back-referenser eller inline-flaggor går inte att kombinera - då
+        # används de separat som tidigare.
+        self.combined_regex = None
+        self.separate_regexes = []
+        combinable = not any(re.search(r'\\[1-9]', p) for p in self.exclude_patterns)
+        if self.exclude_patterns and combinable:
+            try:
+                self.combined_regex = re.compile(
+                    '|'.join(f'(?P<r{i}>{p})' for i, p in enumerate(self.exclude_patterns)),
+                    re.IGNORECASE
+                )
+            except re.error:
+                self.combined_regex = None
+        if self.exclude_patterns and self.combined_regex is None:
+            self.separate_regexes = [
+                (p, re.compile(p, re.IGNORECASE)) for p in self.exclude_patterns
+            ]
+
+    def bind_hits(self, hits: Dict):
+        """Räkna träffar direkt i given dict (t.ex. statistics['filter_hits'])"""
+        self.hits = hits
+
+    def _hit(self, rule: str):
+        self.hits[rule] = self.hits.get(rule, 0) + 1
+
+    def matches_exclude_pattern(self, path: str) -> bool:
+        """En sökning mot det kombinerade regexet istället för en per mönster"""
+        if self.combined_regex is not None:
+            match = self.combined_regex.search(path)
+            if match is None:
+                return False
+            self._hit(f"regex:{self.exclude_patterns[int(match.lastgroup[1:])]}")
+            return True
+
+        for pattern, regex in self.separate_regexes:
+            if regex.search(path):
+                self._hit(f"regex:{pattern}")
+                return True
+        return False
+
+    def excludes_root_folder(self, folder_name: str) -> bool:
+        if folder_name in self.EXCLUDED_ROOT_FOLDERS:
+            self._hit(f"root:{folder_name}")
+            return True
+        return False
+
+    def excludes_directory(self, dir_path: str, depth: int) -> bool:
+        """Mapp-regler - kontrolleras innan mappen läggs till i trädet/kön"""
+        if depth <= 1 and self.excludes_root_folder(os.path.basename(dir_path)):
+            return True
+        return self.matches_exclude_pattern(dir_path)
+
+    def includes_extension(self, extension: str) -> bool:
+        if self.include_extensions is None or extension in self.include_extensions:
+            return True
+        self._hit("extension")
+        return False
+
+
 class OptimizedTreeIndexer:
-    def __init__(self, max_depth=8):
-        self.version = "3.0.0"  # Uppdaterad version: Katasymbol Native (203 DPI)
+    def __init__(self, max_depth=8, progress_reporter=None, verbose=True, stop_event=None,
+                 io_workers=None, hash_mode=None, hash_workers=None,
+                 client_level=None, project_level=None):
+        self.version = "3.5.0"  # Uppdaterad version: Innehålls-hashning
         self.checkpoint_file = None
         self.progress_bar = None
         self.max_depth = max_depth
+        # Multi-volym: extern progress (tqdm-kompatibel), tyst läge och stopp-signal
+        self.progress_reporter = progress_reporter
+        self.verbose = verbose
+        self.stop_event = stop_event
+        # Fast antal samtidiga kataloglistningar (None = adaptivt per enhet)
+        self.io_workers = io_workers
+        # Innehålls-hashning efter metadata-passet: None, 'full' eller 'sparse'
+        self.hash_mode = hash_mode
+        self.hash_workers = hash_workers
+        # Sökvägsnivå för kund/projekt (1 = första mappen) - följer med i scan_info
+        # så att importen kan fylla files.client/project
+        self.client_level = client_level
+        self.project_level = project_level
+        self.customer_level = None  # Nivå (0-baserad) som valts interaktivt i label-steget
+    
+    def _log(self, message: str):
+        """Utskrift från scanningen - tystas när flera volymer scannas samtidigt"""
+        if self.verbose:
+            print(message)
         
     def determine_file_type(self, extension: str) -> str:
-        """Bestäm fil-kategori baserat på extension"""
-        if not extension:
-            return 'other'
-            
-        ext = extension.lower().lstrip('.')
-        
-        # Bilder (inklusive RAW)
-        if ext in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp', 'svg',
-                   'cr2', 'cr3', 'nef', 'arw', 'dng', 'iiq', '3fr', 'orf', 'rw2', 'pef']:
-            return 'image'
-        
-        # Video
-        elif ext in ['mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm', 'm4v', 'mpg', 'mpeg',
-                     'r3d', 'braw', 'mxf', 'prores']:
-            return 'video'
-        
-        # Audio
-        elif ext in ['mp3', 'wav', 'flac', 'aac', 'ogg', 'wma', 'aiff', 'aif', 'm4a']:
-            return 'audio'
-        
-        # Dokument
-        elif ext in ['pdf', 'doc', 'docx', 'txt', 'rtf', 'odt', 'pages', 'ai', 'eps', 'indd', 'psd']:
-            return 'document'
-        
-        # Arkiv
-        elif ext in ['zip', 'rar', '7z', 'tar', 'gz', 'bz2', 'xz', 'dmg', 'iso']:
-            return 'archive'
-        
-        # Kod/Data
-        elif ext in ['js', 'jsx', 'ts', 'tsx', 'html', 'css', 'json', 'xml', 'yml', 'yaml', 
-                     'py', 'java', 'cpp', 'c', 'h', 'sql']:
-            return 'code'
-        
-        else:
-            return 'other'
+        """Bestäm fil-kategori baserat på extension (backend/database/file_categories.py)"""
+        return registry_file_type(extension)
     
-    def _should_exclude_directory(self, dir_path: str, root_path: str, exclude_regexes: List) -> bool:
-        """Gemensam logik för om en mapp ska exkluderas"""
-        
-        # Nivå 0 filtrering - exkludera problematiska root-mappar
-        if dir_path == root_path or os.path.dirname(dir_path) == root_path:
-            folder_name = os.path.basename(dir_path)
-            excluded_root_folders = [
-                'Backups.backupdb',
-                '.Spotlight-V100', 
-                '.TemporaryItems',
-                '.Trashes',
-                '.fseventsd'
-            ]
-            if folder_name in excluded_root_folders:
-                return True
-        
-        # Regex-filtrering
-        if any(regex.search(dir_path) for regex in exclude_regexes):
-            return True
-        
-        return False
-        
     def scan_directory_tree(self, root_path: str, output_file: str = None, 
                            include_extensions: List[str] = None,
                            exclude_patterns: List[str] = None,
@@ -286,12 +447,12 @@ class OptimizedTreeIndexer:
             output_file = f"tree_structure_{timestamp}.json"
             self.checkpoint_file = f"tree_structure_{timestamp}_checkpoint.pkl"
         
-        print(f"📁 Optimized Tree Indexer v{self.version}")
-        print(f"📂 Skannar: {root_path}")
-        print(f"💾 Output: {output_file}")
-        print(f"🔄 Checkpoint: {self.checkpoint_file}")
-        print(f"📏 Max djup: {self.max_depth} nivåer")
-        print(f"⏰ Starttid: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self._log(f"📁 Optimized Tree Indexer v{self.version}")
+        self._log(f"📂 Skannar: {root_path}")
+        self._log(f"💾 Output: {output_file}")
+        self._log(f"🔄 Checkpoint: {self.checkpoint_file}")
+        self._log(f"📏 Max djup: {self.max_depth} nivåer")
+        self._log(f"⏰ Starttid: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Default file extensions (bred täckning för foto/video-arkiv)
         if include_extensions is None:
@@ -321,12 +482,12 @@ class OptimizedTreeIndexer:
                 r'\.VolumeIcon'
             ]
         
-        # Kompilera exclude patterns
-        exclude_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in exclude_patterns]
+        # Kompilera hela filterkonfigurationen till en plan
+        filter_plan = ScanFilterPlan(include_extensions, exclude_patterns)
         
         # Försök återuppta från checkpoint
         if resume and os.path.exists(self.checkpoint_file):
-            print(f"🔄 Hittade checkpoint - återupptar scanning...")
+            self._log(f"🔄 Hittade checkpoint - återupptar scanning...")
             try:
                 with open(self.checkpoint_file, 'rb') as f:
                     checkpoint_data = pickle.load(f)
@@ -335,12 +496,16 @@ class OptimizedTreeIndexer:
                 processed_paths = checkpoint_data['processed_paths']
                 start_time = checkpoint_data['start_time']
                 
-                print(f"📊 Återupptar från: {len(processed_paths)} processade sökvägar")
-                print(f"📄 Redan: {tree_data['statistics']['total_files']} filer, {tree_data['statistics']['total_directories']} mappar")
+                # Checkpoints från före v3.1.0 innehåller dict-noder
+                if not isinstance(tree_data['tree'], DirNode):
+                    raise ValueError("checkpoint har gammalt trädformat")
+                
+                self._log(f"📊 Återupptar från: {len(processed_paths)} processade sökvägar")
+                self._log(f"📄 Redan: {tree_data['statistics']['total_files']} filer, {tree_data['statistics']['total_directories']} mappar")
                 
             except Exception as e:
-                print(f"⚠️ Kunde inte läsa checkpoint: {e}")
-                print("🔄 Startar från början...")
+                self._log(f"⚠️ Kunde inte läsa checkpoint: {e}")
+                self._log("🔄 Startar från början...")
                 tree_data, processed_paths, start_time = self._initialize_scan_data(
                     root_path, include_extensions, exclude_patterns
                 )
@@ -355,16 +520,24 @@ class OptimizedTreeIndexer:
                 root_path, 
                 tree_data, 
                 processed_paths,
-                include_extensions, 
-                exclude_regexes,
+                filter_plan,
                 checkpoint_interval
             )
             
         except KeyboardInterrupt:
-            print(f"\n⚠️ Avbrutet av användaren - sparar checkpoint...")
+            self._log(f"\n⚠️ Avbrutet av användaren - sparar checkpoint...")
             self._save_checkpoint(tree_data, processed_paths, start_time)
             raise
         
+        # Valfritt: hasha filinnehåll (checkpointas separat)
+        if self.hash_mode:
+            self._save_checkpoint(tree_data, processed_paths, start_time)
+            try:
+                self._hash_files(root_path, tree_data, output_file)
+            except KeyboardInterrupt:
+                self._log(f"\n⚠️ Hashning avbruten - färdiga hashar sparade för återupptagning")
+                raise
+        
         # Slutstatistik
         end_time = datetime.now()
         tree_data['statistics']['scan_duration_seconds'] = (end_time - start_time).total_seconds()
@@ -372,23 +545,47 @@ class OptimizedTreeIndexer:
         if self.progress_bar:
             self.progress_bar.close()
         
-        print(f"\n✅ Scanning slutförd!")
-        print(f"📊 Slutstatistik:")
-        print(f"   📁 {tree_data['statistics']['total_directories']} mappar")
-        print(f"   📄 {tree_data['statistics']['total_files']} filer")
-        print(f"   📏 Djup: {tree_data['statistics']['max_depth']} nivåer")
-        print(f"   ⏱️  Tid: {tree_data['statistics']['scan_duration_seconds']:.1f} sekunder")
+        self._log(f"\n✅ Scanning slutförd!")
+        self._log(f"📊 Slutstatistik:")
+        self._log(f"   📁 {tree_data['statistics']['total_directories']} mappar")
+        self._log(f"   📄 {tree_data['statistics']['total_files']} filer")
+        self._log(f"   📏 Djup: {tree_data['statistics']['max_depth']} nivåer")
+        self._log(f"   ⏱️  Tid: {tree_data['statistics']['scan_duration_seconds']:.1f} sekunder")
         
         # Visa filtyp-fördelning
         if tree_data['statistics']['file_types']:
-            print(f"   📋 Filtyper:")
+            self._log(f"   📋 Filtyper:")
             sorted_types = sorted(
                 tree_data['statistics']['file_types'].items(), 
                 key=lambda x: x[1], 
                 reverse=True
             )
             for ftype, count in sorted_types:
-                print(f"      {ftype}: {count:,} filer")
+                self._log(f"      {ftype}: {count:,} filer")
+        
+        # Visa hur I/O-parallellismen landade
+        io_stats = tree_data['statistics'].get('io_concurrency')
+        if io_stats:
+            self._log(f"   💽 I/O: {io_stats['device']} ({io_stats['device_kind']}), "
+                      f"{io_stats['start_limit']} → {io_stats['final_limit']} samtidiga listningar "
+                      f"(max {io_stats['peak_limit']}, {io_stats['adjustments']} justeringar)")
+        
+        hash_stats = tree_data['statistics'].get('hashing')
+        if hash_stats:
+            self._log(f"   🔐 Hashning ({hash_stats['mode']}): {hash_stats['hashed']:,} nya, "
+                      f"{hash_stats['resumed']:,} från checkpoint, {hash_stats['errors']:,} fel, "
+                      f"{hash_stats['bytes_read'] / (1024**3):.1f} GB lästa")
+        
+        # Visa vilka filterregler som träffat mest
+        if tree_data['statistics'].get('filter_hits'):
+            self._log(f"   🚫 Filterträffar:")
+            sorted_hits = sorted(
+                tree_data['statistics']['filter_hits'].items(),
+                key=lambda x: x[1],
+                reverse=True
+            )
+            for rule, count in sorted_hits:
+                self._log(f"      {rule}: {count:,}")
         
         # Spara slutresultat
         self._save_tree_data(tree_data, output_file)
@@ -408,6 +605,8 @@ class OptimizedTreeIndexer:
                 'max_depth': self.max_depth,
                 'include_extensions': include_extensions,
                 'exclude_patterns': exclude_patterns,
+                'client_level': self.client_level,
+                'project_level': self.project_level,
                 'optimized_for': 'Cold Storage v2 with directories table'
             },
             'statistics': {
@@ -418,24 +617,11 @@ class OptimizedTreeIndexer:
                 'max_depth': 0,
                 'largest_file': {'name': '', 'size': 0},
                 'scan_duration_seconds': 0,
-                'directory_depth_distribution': {}  # NY: fördelning av djup-nivåer
+                'directory_depth_distribution': {},  # NY: fördelning av djup-nivåer
+                'filter_hits': {}  # NY: träffar per filterregel
             },
-            'tree': {
-                'type': 'directory',
-                'name': os.path.basename(root_path) or root_path,
-                'path': root_path,
-                'relative_path': '',  # NY: relativ sökväg från root
-                'parent_path': None,  # NY: förälder-sökväg
-                'depth': 0,  # NY: djup-nivå
-                'children': {},
-                'files': [],
-                'metadata': {
-                    'depth': 0,
-                    'file_count': 0,
-                    'subdirectory_count': 0,
-                    'total_size': 0  # NY: total storlek i denna mapp
-                }
-            }
+            # Kompakt nod-träd, konverteras till JSON-formen först i _save_tree_data
+            'tree': DirNode(os.path.basename(root_path) or root_path)
         }
         
         processed_paths = set()
@@ -444,19 +630,24 @@ class OptimizedTreeIndexer:
         return tree_data, processed_paths, start_time
     
     def _scan_level_by_level(self, root_path: str, tree_data: Dict, processed_paths: set,
-                            include_extensions: List[str], exclude_regexes: List,
-                            checkpoint_interval: int):
+                            filter_plan: ScanFilterPlan, checkpoint_interval: int):
         """
         Scanna katalogträd nivå för nivå med progressbar och djup-begränsning
         """
         
         # Första: räkna totalt antal kataloger för progressbar
-        print("🔢 Räknar totalt antal kataloger...")
-        total_dirs = self._count_total_directories(root_path, exclude_regexes)
-        print(f"📊 Totalt {total_dirs:,} kataloger att processa (max djup: {self.max_depth})")
-        
-        # Skapa progressbar
-        if HAS_TQDM:
+        self._log("🔢 Räknar totalt antal kataloger...")
+        total_dirs = self._count_total_directories(root_path, filter_plan)
+        self._log(f"📊 Totalt {total_dirs:,} kataloger att processa (max djup: {self.max_depth})")
+        
+        # Räkna filterträffar i statistiken först nu (inte under förräkningen)
+        filter_plan.bind_hits(tree_data['statistics'].setdefault('filter_hits', {}))
+        
+        # Skapa progressbar (extern reporter vid multi-volym scanning)
+        if self.progress_reporter is not None:
+            self.progress_bar = self.progress_reporter
+            self.progress_bar.reset(total=total_dirs)
+        elif HAS_TQDM:
             self.progress_bar = tqdm(
                 total=total_dirs,
                 desc="Scannar kataloger",
@@ -464,63 +655,82 @@ class OptimizedTreeIndexer:
                 bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]"
             )
         
+        # I/O-styrning: startpunkt efter enhetstyp, justeras under scanningen
+        device, kind = device_io_kind(root_path)
+        io_controller = AdaptiveIOController(kind, device, fixed=self.io_workers)
+        self._log(f"💽 Enhet: {device} ({kind}), startar med {io_controller.limit} samtidiga listningar")
+        executor = ThreadPoolExecutor(max_workers=io_controller.max_limit,
+                                      thread_name_prefix="scandir")
+        
         # Kö för nivå-för-nivå scanning
-        current_level = deque([(root_path, tree_data['tree'], 0, '')])  # (full_path, tree_node, depth, relative_path)
+        current_level = deque([(root_path, tree_data['tree'], 0)])  # (full_path, tree_node, depth)
         checkpoint_counter = 0
         
-        while current_level:
-            next_level = deque()
-            
-            # Processa alla kataloger på nuvarande nivå
+        try:
             while current_level:
-                dir_path, tree_node, depth, relative_path = current_level.popleft()
-                
-                # DJUP-BEGRÄNSNING
-                if depth > self.max_depth:
-                    if HAS_TQDM and self.progress_bar:
-                        self.progress_bar.update(1)
-                    continue
-                
-                # Hoppa över om redan processad
-                if dir_path in processed_paths:
-                    if HAS_TQDM and self.progress_bar:
-                        self.progress_bar.update(1)
-                    continue
+                next_level = deque()
+                # Listningar i luften, i köordning så att resultatet blir deterministiskt
+                in_flight = deque()
                 
-                # Hoppa över exkluderade mappar
-                if self._should_exclude_directory(dir_path, root_path, exclude_regexes):
-                    if HAS_TQDM and self.progress_bar:
+                # Processa alla kataloger på nuvarande nivå
+                while current_level or in_flight:
+                    # Stopp-signal från multi-volym scanning (Ctrl+C i huvudtråden)
+                    if self.stop_event is not None and self.stop_event.is_set():
+                        raise KeyboardInterrupt
+                    
+                    # Fyll på upp till controllerns aktuella gräns
+                    while current_level and len(in_flight) < io_controller.limit:
+                        dir_path, tree_node, depth = current_level.popleft()
+                        
+                        # DJUP-BEGRÄNSNING, redan processad eller exkluderad root
+                        # (undermappar filtreras redan innan de köas)
+                        if (depth > self.max_depth
+                                or dir_path in processed_paths
+                                or (depth == 0 and filter_plan.excludes_directory(dir_path, depth))):
+                            if self.progress_bar:
+                                self.progress_bar.update(1)
+                            continue
+                        
+                        future = executor.submit(
+                            self._list_directory, dir_path, filter_plan.include_extensions, io_controller
+                        )
+                        in_flight.append((future, dir_path, tree_node, depth))
+                    
+                    if not in_flight:
+                        continue
+                    
+                    # Slå ihop äldsta listningen i huvudtråden
+                    future, dir_path, tree_node, depth = in_flight.popleft()
+                    self._process_directory(
+                        dir_path, tree_node, depth, future.result(), filter_plan,
+                        tree_data['statistics'], next_level
+                    )
+                    
+                    processed_paths.add(dir_path)
+                    checkpoint_counter += 1
+                    
+                    # Uppdatera progressbar
+                    if self.progress_bar:
+                        self.progress_bar.set_postfix({
+                            'filer': f"{tree_data['statistics']['total_files']:,}",
+                            'djup': depth,
+                            'typer': len(tree_data['statistics']['file_types']),
+                            'io': io_controller.limit
+                        })
                         self.progress_bar.update(1)
-                    continue
-                
-                # Processa denna katalog
-                self._process_directory(
-                    dir_path, tree_node, depth, relative_path,
-                    include_extensions, exclude_regexes,
-                    tree_data['statistics'], next_level
-                )
-                
-                processed_paths.add(dir_path)
-                checkpoint_counter += 1
-                
-                # Uppdatera progressbar
-                if HAS_TQDM and self.progress_bar:
-                    self.progress_bar.set_postfix({
-                        'filer': f"{tree_data['statistics']['total_files']:,}",
-                        'djup': depth,
-                        'typer': len(tree_data['statistics']['file_types'])
-                    })
-                    self.progress_bar.update(1)
+                    
+                    # Spara checkpoint (bara kataloger som slagits ihop finns i processed_paths)
+                    if checkpoint_counter >= checkpoint_interval:
+                        self._save_checkpoint(tree_data, processed_paths, datetime.now())
+                        checkpoint_counter = 0
                 
-                # Spara checkpoint
-                if checkpoint_counter >= checkpoint_interval:
-                    self._save_checkpoint(tree_data, processed_paths, datetime.now())
-                    checkpoint_counter = 0
-            
-            # Nästa nivå blir nuvarande nivå
-            current_level = next_level
+                # Nästa nivå blir nuvarande nivå
+                current_level = next_level
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            tree_data['statistics']['io_concurrency'] = io_controller.summary()
     
-    def _count_total_directories(self, root_path: str, exclude_regexes: List) -> int:
+    def _count_total_directories(self, root_path: str, filter_plan: ScanFilterPlan) -> int:
         """Räkna totalt antal kataloger (för progressbar) med djup-begränsning"""
         
         total = 0
@@ -534,8 +744,8 @@ class OptimizedTreeIndexer:
             if current_depth > self.max_depth:
                 continue
             
-            # Exkludering
-            if self._should_exclude_directory(current_path, root_path, exclude_regexes):
+            # Exkludering (undermappar filtreras redan innan de läggs på stacken)
+            if current_depth == 0 and filter_plan.excludes_directory(current_path, current_depth):
                 continue
             
             try:
@@ -547,7 +757,7 @@ class OptimizedTreeIndexer:
                     for item in items:
                         item_path = os.path.join(current_path, item)
                         
-                        if self._should_exclude_directory(item_path, root_path, exclude_regexes):
+                        if filter_plan.excludes_directory(item_path, current_depth + 1):
                             continue
                         
                         if os.path.isdir(item_path):
@@ -559,11 +769,48 @@ class OptimizedTreeIndexer:
         
         return total
     
-    def _process_directory(self, dir_path: str, tree_node: Dict, depth: int, relative_path: str,
-                          include_extensions: List[str], exclude_regexes: List,
+    @staticmethod
+    def _list_directory(dir_path: str, include_extensions, io_controller: 'AdaptiveIOController'):
+        """
+        Lista en katalog i en arbetstråd - bara I/O, inga delade strukturer.
+
+        Returnerar (poster, fel) där poster är sorterade (namn, är_mapp, stat).
+        Filer som ändå filtreras bort på extension stat:as inte.
+        """
+        started = time.perf_counter()
+        entries = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            entries.append((entry.name, True, None))
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    file_stat = None
+                    if (include_extensions is None
+                            or Path(entry.name).suffix.lower() in include_extensions):
+                        try:
+                            file_stat = entry.stat()
+                        except OSError:
+                            pass
+                    entries.append((entry.name, False, file_stat))
+        except Exception as e:
+            io_controller.record(time.perf_counter() - started, 0)
+            return None, e
+        
+        io_controller.record(time.perf_counter() - started, len(entries))
+        entries.sort(key=lambda item: item[0])
+        return entries, None
+    
+    def _process_directory(self, dir_path: str, tree_node: DirNode, depth: int,
+                          listing: Tuple[List, Exception], filter_plan: ScanFilterPlan,
                           statistics: Dict, next_level: deque):
         """
-        Processa en enskild katalog med optimerad metadata och djup-begränsning
+        Processa en listad katalog med optimerad metadata och djup-begränsning
         """
         
         # DJUP-BEGRÄNSNING
@@ -576,74 +823,53 @@ class OptimizedTreeIndexer:
             statistics['directory_depth_distribution'][depth] = 0
         statistics['directory_depth_distribution'][depth] += 1
         
-        try:
-            items = os.listdir(dir_path)
-        except PermissionError:
-            if not HAS_TQDM:
-                print(f"⚠️ Ingen åtkomst till: {dir_path}")
-            return
-        except Exception as e:
+        entries, error = listing
+        if error is not None:
             if not HAS_TQDM:
-                print(f"❌ Fel vid läsning av {dir_path}: {e}")
+                if isinstance(error, PermissionError):
+                    self._log(f"⚠️ Ingen åtkomst till: {dir_path}")
+                else:
+                    self._log(f"❌ Fel vid läsning av {dir_path}: {error}")
             return
         
-        # Sortera items
-        items.sort()
-        
         total_size = 0
         
-        for item in items:
+        for item, is_dir, file_stat in entries:
             item_path = os.path.join(dir_path, item)
             
-            # Kontrollera exclude patterns
-            if any(regex.search(item_path) for regex in exclude_regexes):
+            # Kontrollera exclude patterns (ett kombinerat regex)
+            if filter_plan.matches_exclude_pattern(item_path):
                 continue
             
-            if os.path.isdir(item_path):
+            if is_dir:
                 # Hoppa över om vi når max djup
                 if depth >= self.max_depth:
                     continue
-                    
-                # Skapa mapp-nod med optimerad struktur
-                child_relative_path = f"{relative_path}/{item}" if relative_path else item
-                
-                child_node = {
-                    'type': 'directory',
-                    'name': item,
-                    'path': item_path,
-                    'relative_path': child_relative_path,  # NY: relativ sökväg
-                    'parent_path': relative_path if relative_path else None,  # NY: förälder
-                    'depth': depth + 1,  # NY: djup-nivå
-                    'children': {},
-                    'files': [],
-                    'metadata': {
-                        'depth': depth + 1,
-                        'file_count': 0,
-                        'subdirectory_count': 0,
-                        'total_size': 0
-                    }
-                }
                 
-                tree_node['children'][item] = child_node
-                tree_node['metadata']['subdirectory_count'] += 1
+                # Mapp-regler kontrolleras innan noden skapas och köas
+                if depth == 0 and filter_plan.excludes_root_folder(item):
+                    continue
+                    
+                # Skapa kompakt mapp-nod
+                child_node = tree_node.add_child(item)
                 statistics['total_directories'] += 1
                 
                 # Lägg till i nästa nivå
-                next_level.append((item_path, child_node, depth + 1, child_relative_path))
+                next_level.append((item_path, child_node, depth + 1))
                 
-            elif os.path.isfile(item_path):
+            else:
                 # Processa fil
                 file_size = self._process_file(
-                    item, item_path, relative_path, include_extensions,
+                    item, item_path, file_stat, filter_plan,
                     tree_node, statistics
                 )
                 total_size += file_size
         
         # Uppdatera total storlek för denna mapp
-        tree_node['metadata']['total_size'] = total_size
+        tree_node.total_size = total_size
     
-    def _process_file(self, filename: str, file_path: str, relative_dir_path: str,
-                     include_extensions: List[str], tree_node: Dict, 
+    def _process_file(self, filename: str, file_path: str, file_stat: os.stat_result,
+                     filter_plan: ScanFilterPlan, tree_node: DirNode, 
                      statistics: Dict) -> int:
         """
         Processa en enskild fil med optimerad metadata
@@ -651,12 +877,14 @@ class OptimizedTreeIndexer:
         
         file_ext = Path(filename).suffix.lower()
         
-        # Kontrollera filextension
-        if include_extensions and file_ext not in include_extensions:
+        # Kontrollera filextension (hash-set)
+        if not filter_plan.includes_extension(file_ext):
             return 0
         
         try:
-            file_stat = os.stat(file_path)
+            if file_stat is None:
+                # stat misslyckades i listningen - försök en gång till
+                file_stat = os.stat(file_path)
             file_size = file_stat.st_size
             
             # Bestäm filtyp
@@ -664,7 +892,6 @@ class OptimizedTreeIndexer:
             
             # Uppdatera statistik
             statistics['total_files'] += 1
-            tree_node['metadata']['file_count'] += 1
             
             # Extension-statistik
             if file_ext not in statistics['file_extensions']:
@@ -683,28 +910,57 @@ class OptimizedTreeIndexer:
                     'size': file_size
                 }
             
-            # Optimerad fil-info för import
-            file_info = {
-                'name': filename,
-                'path': file_path,
-                'relative_path': f"{relative_dir_path}/{filename}" if relative_dir_path else filename,  # NY
-                'parent_directory': relative_dir_path,  # NY: föräldermapp
-                'extension': file_ext,
-                'size': file_size,
-                'type': file_type,  # NY: kategoriserad typ
-                'modified': datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
-                'created': datetime.fromtimestamp(file_stat.st_ctime).isoformat()
-            }
-            
-            tree_node['files'].append(file_info)
+            # Kompakt fil-post, sökvägar byggs först vid skrivning
+            tree_node.add_file(FileRecord(
+                filename, file_ext, file_size, file_type,
+                file_stat.st_mtime, file_stat.st_ctime,
+                file_stat.st_ino if self.hash_mode else None
+            ))
             
             return file_size
             
         except (OSError, IOError) as e:
             if not HAS_TQDM:
-                print(f"⚠️ Kunde inte läsa fil {file_path}: {e}")
+                self._log(f"⚠️ Kunde inte läsa fil {file_path}: {e}")
             return 0
     
+    def _hash_files(self, root_path: str, tree_data: Dict, output_file: str):
+        """Hasha alla indexerade filer och lägg checksumman på fil-posterna"""
+        
+        jobs = []
+        stack = [(tree_data['tree'], root_path, '')]
+        while stack:
+            node, dir_path, relative_path = stack.pop()
+            for record in node.files or ():
+                jobs.append((
+                    f"{relative_path}/{record.name}" if relative_path else record.name,
+                    os.path.join(dir_path, record.name),
+                    record
+                ))
+            for child in node.iter_children():
+                stack.append((
+                    child,
+                    os.path.join(dir_path, child.name),
+                    f"{relative_path}/{child.name}" if relative_path else child.name
+                ))
+        
+        _, kind = device_io_kind(root_path)
+        hasher = ContentHasher(
+            mode=self.hash_mode,
+            workers=self.hash_workers,
+            device_kind=kind,
+            checkpoint_file=output_file.replace('.json', '_hashes.pkl'),
+            stop_event=self.stop_event
+        )
+        self._log(f"🔐 Hashar {len(jobs):,} filer ({self.hash_mode}, {hasher.workers} läsare)...")
+        
+        progress = self.progress_bar
+        if progress is not None and self.progress_reporter is None:
+            progress.close()
+            progress = self.progress_bar = tqdm(total=len(jobs), desc="Hashar filer", unit="fil")
+        
+        tree_data['statistics']['hashing'] = hasher.run(jobs, progress)
+    
     def _save_checkpoint(self, tree_data: Dict, processed_paths: set, start_time: datetime):
         """Spara checkpoint för återupptagning"""
         
@@ -720,11 +976,11 @@ class OptimizedTreeIndexer:
                 pickle.dump(checkpoint_data, f)
             
             if not HAS_TQDM:
-                print(f"💾 Checkpoint sparad: {len(processed_paths)} kataloger, {tree_data['statistics']['total_files']} filer")
+                self._log(f"💾 Checkpoint sparad: {len(processed_paths)} kataloger, {tree_data['statistics']['total_files']} filer")
                 
         except Exception as e:
             if not HAS_TQDM:
-                print(f"⚠️ Kunde inte spara checkpoint: {e}")
+                self._log(f"⚠️ Kunde inte spara checkpoint: {e}")
     
     def ask_for_customer_level(self, tree: Dict, max_attempts: int = 4) -> List[str]:
         """
@@ -737,7 +993,7 @@ class OptimizedTreeIndexer:
         def get_folders_at_level(node, current_level, target_level):
             """Hämta alla mappar på en specifik nivå och filtrera systemfiler"""
             if current_level == target_level:
-                all_folders = list(node.get('children', {}).keys())
+                all_folders = node.child_names()
                 
                 # SYSTEMFILER ATT FILTRERA BORT
                 system_folders = {
@@ -784,7 +1040,7 @@ class OptimizedTreeIndexer:
             
             # För djupare nivåer - rekursiv sökning
             folders = []
-            for child in node.get('children', {}).values():
+            for child in node.iter_children():
                 folders.extend(get_folders_at_level(child, current_level + 1, target_level))
             return folders
         
@@ -815,6 +1071,7 @@ class OptimizedTreeIndexer:
                 
                 if response in ['j', 'ja', 'y', 'yes']:
                     print(f"✅ Använder nivå {level} som kundnivå")
+                    self.customer_level = level
                     # SORTERA ALFABETISKT innan returnering
                     sorted_folders = sorted(folders, key=str.lower)
                     print(f"📋 Returnerar {len(sorted_folders)} kundmappar")
@@ -1127,26 +1384,697 @@ class OptimizedTreeIndexer:
     def _save_tree_data(self, tree_data: Dict, output_file: str):
         """Spara träd-data till fil"""
         
-        print(f"💾 Sparar träd-data till: {output_file}")
+        self._log(f"💾 Sparar träd-data till: {output_file}")
         
         # Skapa output-katalog om den inte finns
         output_dir = os.path.dirname(output_file)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
         
-        # Spara som JSON
+        # Spara som JSON - trädet strömmas nod för nod så att hela
+        # JSON-formen aldrig behöver finnas i minnet samtidigt
+        root_path = tree_data['scan_info']['root_path']
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(tree_data, f, indent=2, ensure_ascii=False)
-        
+            f.write('{\n')
+            for key in ('scan_info', 'statistics'):
+                f.write(f'"{key}": ')
+                json.dump(tree_data[key], f, indent=2, ensure_ascii=False)
+                f.write(',\n')
+            f.write('"tree": ')
+            self._write_tree_node(f, tree_data['tree'], root_path, '')
+            f.write('\n}\n')
+
         file_size = os.path.getsize(output_file)
-        print(f"✅ Träd-data sparad ({file_size / 1024:.1f} KB)")
-        print(f"🚀 Optimerad för Cold Storage v2 import!")
+        self._log(f"✅ Träd-data sparad ({file_size / 1024:.1f} KB)")
+        self._log(f"🚀 Optimerad för Cold Storage v2 import!")
+
+    def _write_tree_node(self, f, node: DirNode, dir_path: str, relative_path: str):
+        """Skriv en DirNode (rekursivt) i samma JSON-form som tidigare versioner"""
+
+        def dumps(value):
+            return json.dumps(value, ensure_ascii=False)
+
+        f.write('{"type": "directory"')
+        f.write(f', "name": {dumps(node.name)}')
+        f.write(f', "path": {dumps(dir_path)}')
+        f.write(f', "relative_path": {dumps(relative_path)}')
+        parent_path = (relative_path.rpartition('/')[0] or None) if node.parent is not None else None
+        f.write(f', "parent_path": {dumps(parent_path)}')
+        f.write(f', "depth": {node.depth}')
+
+        f.write(', "children": {')
+        for i, child in enumerate(node.iter_children()):
+            if i:
+                f.write(',')
+            f.write(f'\n{dumps(child.name)}: ')
+            child_relative = f"{relative_path}/{child.name}" if relative_path else child.name
+            self._write_tree_node(f, child, os.path.join(dir_path, child.name), child_relative)
+        f.write('}')
+
+        f.write(', "files": [')
+        for i, record in enumerate(node.files or ()):
+            if i:
+                f.write(',')
+            f.write('\n')
+            f.write(dumps(record.to_dict(dir_path, relative_path)))
+        f.write(']')
+
+        f.write(f', "metadata": {dumps(node.metadata_dict())}}}')
+
+def physical_device_key(path: str) -> str:
+    """
+    Identifiera den fysiska enhet en sökväg ligger på.
+
+    På Linux slås major:minor upp i /sys/dev/block så att två partitioner på
+    samma disk hamnar på samma nyckel (t.ex. 'sdb'). Annars (macOS, nätverks-
+    shares) används st_dev direkt.
+    """
+    st_dev = os.stat(path).st_dev
+    sys_path = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+    try:
+        device_dir = os.path.realpath(sys_path)
+        if not os.path.isdir(device_dir):
+            raise OSError(sys_path)
+        # Partition -> föräldern är själva disken
+        if os.path.exists(os.path.join(device_dir, 'partition')):
+            device_dir = os.path.dirname(device_dir)
+        return os.path.basename(device_dir)
+    except OSError:
+        return f"dev-{st_dev}"
+
+
+def device_io_kind(path: str) -> Tuple[str, str]:
+    """
+    Klassa volymens enhet som ('sdb', 'rotational'|'ssd'|'network').
+
+    Läser /sys/block/<disk>/queue/rotational på Linux. Volymer utan
+    blockenhet (NFS/SMB/FUSE) räknas som nätverk.
+    """
+    device = physical_device_key(path)
+    if device.startswith('dev-'):
+        return device, 'network'
+    try:
+        with open(f"/sys/block/{device}/queue/rotational") as f:
+            return device, 'rotational' if f.read().strip() == '1' else 'ssd'
+    except OSError:
+        return device, 'ssd'
+
+
+class AdaptiveIOController:
+    """
+    Styr hur många kataloglistningar som får vara i luften samtidigt (v3.4.0).
+
+    Startpunkten sätts efter enhetstyp (snurrdiskar börjar seriellt, SSD och
+    nätverk parallellt). Under scanningen mäts latens och genomströmning
+    (poster/s) per fönster och gränsen justeras AIMD-style: +1 så länge
+    genomströmningen ökar, halvering när latensen rusar utan att
+    genomströmningen hänger med, och ett steg tillbaka när den sjunker.
+    """
+
+    # (start, max) per enhetstyp
+    PROFILES = {
+        'rotational': (1, 4),
+        'ssd': (4, 32),
+        'network': (8, 64),
+    }
+
+    def __init__(self, kind: str = 'ssd', device: str = None, fixed: int = None,
+                 min_window: int = 16, min_window_seconds: float = 0.5):
+        start, max_limit = self.PROFILES.get(kind, self.PROFILES['ssd'])
+        if fixed:
+            start = max_limit = max(1, fixed)
+        self.kind = kind
+        self.device = device
+        self.adaptive = not fixed
+        self.limit = start
+        self.start_limit = start
+        self.max_limit = max_limit
+        self.peak_limit = start
+        self.adjustments = 0
+        self.min_window = min_window
+        self.min_window_seconds = min_window_seconds
+
+        self._lock = threading.Lock()
+        self._window_start = time.perf_counter()
+        self._window_count = 0
+        self._window_entries = 0
+        self._window_latency = 0.0
+        self._last_throughput = None
+        self._baseline_latency = None
+        self._stable_windows = 0
+
+    def record(self, latency: float, entries: int):
+        """Registrera en avslutad kataloglistning (anropas från arbetstrådar)"""
+        with self._lock:
+            self._window_count += 1
+            self._window_entries += entries
+            self._window_latency += latency
+
+            now = time.perf_counter()
+            elapsed = now - self._window_start
+            if (self._window_count < max(self.min_window, 2 * self.limit)
+                    or elapsed < self.min_window_seconds):
+                return
+
+            throughput = (self._window_entries + self._window_count) / elapsed
+            latency_avg = self._window_latency / self._window_count
+            self._window_start = now
+            self._window_count = 0
+            self._window_entries = 0
+            self._window_latency = 0.0
+
+            if self.adaptive:
+                self._adjust(throughput, latency_avg)
+            self._last_throughput = throughput
+
+    def _adjust(self, throughput: float, latency: float):
+        if self._baseline_latency is None or latency < self._baseline_latency:
+            self._baseline_latency = latency
+
+        previous = self._last_throughput
+        new_limit = self.limit
+        if previous is None:
+            # Första fönstret: prova ett steg uppåt
+            new_limit = self.limit + 1
+        elif throughput >= previous * 1.05:
+            # Additiv ökning så länge det lönar sig
+            new_limit = self.limit + 1
+            self._stable_windows = 0
+        elif latency > 3 * self._baseline_latency and throughput < previous * 1.05:
+            # Kön växer utan att ge mer - multiplikativ minskning
+            new_limit = self.limit // 2
+            self._stable_windows = 0
+        elif throughput < previous * 0.9:
+            new_limit = self.limit - 1
+            self._stable_windows = 0
+        else:
+            # Platå - prova uppåt igen då och då (lasten kan ha ändrats)
+            self._stable_windows += 1
+            if self._stable_windows >= 5:
+                new_limit = self.limit + 1
+                self._stable_windows = 0
+
+        new_limit = max(1, min(self.max_limit, new_limit))
+        if new_limit != self.limit:
+            self.limit = new_limit
+            self.adjustments += 1
+            self.peak_limit = max(self.peak_limit, new_limit)
+
+    def summary(self) -> Dict:
+        return {
+            'device': self.device,
+            'device_kind': self.kind,
+            'adaptive': self.adaptive,
+            'start_limit': self.start_limit,
+            'final_limit': self.limit,
+            'peak_limit': self.peak_limit,
+            'adjustments': self.adjustments
+        }
+
+
+class ContentHasher:
+    """
+    Innehålls-hashning efter metadata-passet (v3.5.0).
+
+    Filerna läses i stora sekventiella block av en trådpool, sorterade på
+    inode-nummer som närmaste billiga approximation av diskposition. BLAKE2b
+    (256 bitar) från hashlib. I 'sparse'-läge hashas stora videofiler bara
+    i början, mitten och slutet (plus storleken) - checksumman får då ett
+    eget prefix så att den aldrig jämförs med en fullständig.
+
+    Färdiga hashar checkpointas (sökväg -> storlek, mtime, checksumma) så
+    att en avbruten körning fortsätter där den slutade.
+    """
+
+    FULL_PREFIX = 'blake2b-256'
+    SPARSE_PREFIX = 'blake2b-256-sparse'
+
+    # Parallella läsare per enhetstyp - snurrdiskar läses en fil i taget
+    WORKERS = {
+        'rotational': 1,
+        'ssd': 4,
+        'network': 4,
+    }
+
+    def __init__(self, mode: str = 'full', workers: int = None, device_kind: str = 'ssd',
+                 chunk_size: int = 8 * 1024 * 1024,
+                 sparse_threshold: int = 1024 * 1024 * 1024,
+                 sparse_span: int = 16 * 1024 * 1024,
+                 checkpoint_file: str = None, checkpoint_seconds: float = 30.0,
+                 stop_event: threading.Event = None):
+        if mode not in ('full', 'sparse'):
+            raise ValueError(f"Okänt hash-läge: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers or self.WORKERS.get(device_kind, 1))
+        self.chunk_size = chunk_size
+        self.sparse_threshold = sparse_threshold
+        self.sparse_span = sparse_span
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_seconds = checkpoint_seconds
+        self.stop_event = stop_event
+        self.done = {}  # relativ sökväg -> (storlek, mtime, checksumma)
+        self._buffers = threading.local()
+
+    def _is_sparse(self, record: FileRecord) -> bool:
+        return (self.mode == 'sparse' and record.type == 'video'
+                and record.size > self.sparse_threshold)
+
+    def hash_file(self, path: str, size: int, sparse: bool) -> Tuple[str, int]:
+        """Returnerar (checksumma, lästa bytes)"""
+        digest = hashlib.blake2b(digest_size=32)
+        # En läsbuffert per arbetstråd, återanvänds mellan filer
+        view = getattr(self._buffers, 'view', None)
+        if view is None:
+            view = self._buffers.view = memoryview(bytearray(self.chunk_size))
+        bytes_read = 0
+
+        with open(path, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+
+            if sparse:
+                digest.update(size.to_bytes(8, 'little'))
+                offsets = (0, max(0, size // 2 - self.sparse_span // 2), max(0, size - self.sparse_span))
+                ranges = [(offset, self.sparse_span) for offset in offsets]
+            else:
+                ranges = [(0, None)]
+
+            for offset, length in ranges:
+                f.seek(offset)
+                remaining = length
+                while remaining is None or remaining > 0:
+                    want = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+                    n = f.readinto(view[:want])
+                    if not n:
+                        break
+                    digest.update(view[:n])
+                    bytes_read += n
+                    if remaining is not None:
+                        remaining -= n
+
+        prefix = self.SPARSE_PREFIX if sparse else self.FULL_PREFIX
+        return f"{prefix}:{digest.hexdigest()}", bytes_read
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return
+        try:
+            with open(self.checkpoint_file, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('mode') == self.mode:
+                self.done = data['hashes']
+        except Exception:
+            self.done = {}
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_file:
+            return
+        tmp_file = f"{self.checkpoint_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({'mode': self.mode, 'hashes': self.done}, f)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def run(self, jobs: List[Tuple[str, str, FileRecord]], progress=None) -> Dict:
+        """
+        jobs: lista av (relativ sökväg, absolut sökväg, FileRecord).
+        Sätter record.checksum och returnerar statistik för statistics['hashing'].
+        """
+        started = time.perf_counter()
+        self._load_checkpoint()
+
+        stats = {'mode': self.mode, 'workers': self.workers, 'hashed': 0, 'resumed': 0,
+                 'sparse': 0, 'errors': 0, 'bytes_read': 0}
+        pending = []
+        for relative_path, path, record in jobs:
+            previous = self.done.get(relative_path)
+            if previous and previous[0] == record.size and previous[1] == record.mtime:
+                record.checksum = previous[2]
+                stats['resumed'] += 1
+            else:
+                pending.append((relative_path, path, record))
+
+        # Närmast diskordning: inode-nummer
+        pending.sort(key=lambda job: getattr(job[2], 'inode', None) or 0)
+
+        if progress is not None:
+            progress.reset(total=len(jobs))
+            progress.update(stats['resumed'])
+
+        last_checkpoint = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash")
+        in_flight = deque()
+        jobs_iter = iter(pending)
+        try:
+            while True:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    raise KeyboardInterrupt
+
+                # Håll poolen full men begränsa kön (minne för futures)
+                while len(in_flight) < self.workers * 2:
+                    job = next(jobs_iter, None)
+                    if job is None:
+                        break
+                    sparse = self._is_sparse(job[2])
+                    in_flight.append((job, sparse,
+                                      executor.submit(self.hash_file, job[1], job[2].size, sparse)))
+                if not in_flight:
+                    break
+
+                (relative_path, path, record), sparse, future = in_flight.popleft()
+                try:
+                    checksum, bytes_read = future.result()
+                except OSError:
+                    stats['errors'] += 1
+                else:
+                    record.checksum = checksum
+                    self.done[relative_path] = (record.size, record.mtime, checksum)
+                    stats['hashed'] += 1
+                    stats['sparse'] += int(sparse)
+                    stats['bytes_read'] += bytes_read
+
+                if progress is not None:
+                    progress.update(1)
+
+                if time.perf_counter() - last_checkpoint >= self.checkpoint_seconds:
+                    self._save_checkpoint()
+                    last_checkpoint = time.perf_counter()
+        except KeyboardInterrupt:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._save_checkpoint()
+            raise
+        executor.shutdown(wait=True)
+
+        # Klart - checkpointen behövs inte längre
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+        stats['seconds'] = round(time.perf_counter() - started, 1)
+        return stats
+
+
+class _TextProgress:
+    """Minimal tqdm-ersättare för en volym när tqdm saknas"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.n = 0
+        self.total = 0
+        self.postfix = {}
+
+    def reset(self, total=None):
+        self.n = 0
+        self.total = total or 0
+
+    def update(self, n=1):
+        self.n += n
+
+    def set_postfix(self, postfix=None, **kwargs):
+        self.postfix = dict(postfix or {}, **kwargs)
+
+    def close(self):
+        pass
+
+    def summary(self) -> str:
+        files = self.postfix.get('filer', '0')
+        return f"{self.name}: {self.n:,}/{self.total:,} mappar, {files} filer"
+
+
+class MultiVolumeProgress:
+    """
+    Kombinerad progress-visning för flera samtidiga volymer.
+
+    Med tqdm får varje volym en egen rad (position); utan tqdm skrivs en
+    sammanfattningsrad ut med jämna mellanrum från en bakgrundstråd.
+    """
+
+    def __init__(self, volume_names: List[str], interval: float = 10.0):
+        self.interval = interval
+        self.reporters = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        width = min(max((len(n) for n in volume_names), default=10), 24)
+        for position, name in enumerate(volume_names):
+            if HAS_TQDM:
+                self.reporters[name] = tqdm(
+                    total=0,
+                    desc=name[:width].ljust(width),
+                    unit="dir",
+                    position=position,
+                    leave=True,
+                    bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}, {rate_fmt}{postfix}]"
+                )
+            else:
+                self.reporters[name] = _TextProgress(name)
+
+        if not HAS_TQDM:
+            self._thread = threading.Thread(target=self._report_loop, daemon=True)
+            self._thread.start()
+
+    def reporter(self, name: str):
+        return self.reporters[name]
+
+    def _report_loop(self):
+        while not self._stop.wait(self.interval):
+            print("📊 " + " | ".join(r.summary() for r in self.reporters.values()))
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        for reporter in self.reporters.values():
+            reporter.close()
+
+
+class MultiVolumeScanner:
+    """
+    Scanna flera monterade volymer samtidigt (v3.3.0).
+
+    Volymerna grupperas per fysisk enhet och varje enhet får en egen
+    trådpool, så att alla diskar arbetar parallellt medan volymer på samma
+    disk (default) tas en i taget för att undvika seek-thrash. Varje volym
+    skriver eget index och egen checkpoint.
+    """
+
+    def __init__(self, max_depth: int = 8, volumes_per_device: int = 1, io_workers: int = None,
+                 hash_mode: str = None, hash_workers: int = None,
+                 client_level: int = None, project_level: int = None):
+        self.max_depth = max_depth
+        self.volumes_per_device = max(1, volumes_per_device)
+        self.io_workers = io_workers
+        self.hash_mode = hash_mode
+        self.hash_workers = hash_workers
+        self.client_level = client_level
+        self.project_level = project_level
+        self.stop_event = threading.Event()
+
+    def scan(self, volumes: List[Tuple[str, str]], include_extensions: List[str] = None,
+             exclude_patterns: List[str] = None, resume: bool = True,
+             checkpoint_interval: int = 1000) -> Dict[str, object]:
+        """
+        volumes: lista av (sökväg, output-fil).
+        Returnerar {sökväg: tree_data eller Exception}.
+        """
+
+        # Gruppera per fysisk enhet
+        by_device = {}
+        for path, output_file in volumes:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Sökväg finns inte: {path}")
+            by_device.setdefault(physical_device_key(path), []).append((path, output_file))
+
+        print(f"💽 {len(volumes)} volymer på {len(by_device)} enheter:")
+        for device, device_volumes in by_device.items():
+            print(f"   {device}: {', '.join(p for p, _ in device_volumes)}")
+
+        names = [os.path.basename(p.rstrip('/')) or p for p, _ in volumes]
+        progress = MultiVolumeProgress(names)
+
+        pools = {
+            device: ThreadPoolExecutor(max_workers=self.volumes_per_device,
+                                       thread_name_prefix=f"scan-{device}")
+            for device in by_device
+        }
+        futures = {}
+        for device, device_volumes in by_device.items():
+            for path, output_file in device_volumes:
+                name = os.path.basename(path.rstrip('/')) or path
+                indexer = OptimizedTreeIndexer(
+                    max_depth=self.max_depth,
+                    progress_reporter=progress.reporter(name),
+                    verbose=False,
+                    stop_event=self.stop_event,
+                    io_workers=self.io_workers,
+                    hash_mode=self.hash_mode,
+                    hash_workers=self.hash_workers,
+                    client_level=self.client_level,
+                    project_level=self.project_level
+                )
+                future = pools[device].submit(
+                    indexer.scan_directory_tree, path, output_file,
+                    include_extensions, exclude_patterns, resume, checkpoint_interval
+                )
+                futures[future] = path
+
+        results = {}
+        interrupted = False
+        try:
+            pending = set(futures)
+            while pending:
+                # Kort timeout så att Ctrl+C når huvudtråden
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        results[futures[future]] = future.result()
+                    except BaseException as e:
+                        results[futures[future]] = e
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n⚠️ Avbrutet - stoppar alla volymer och sparar checkpoints...")
+            self.stop_event.set()
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+            progress.close()
+
+        if interrupted:
+            raise KeyboardInterrupt
+        return results
+
+
+def _output_names(path: str, output: str = None, output_dir: str = None) -> Tuple[str, str]:
+    """Bestäm output-fil och 'safe name' (för label/URL) för en volym"""
+    if not output:
+        disk_name = os.path.basename(path.rstrip('/')) or 'UnknownDisk'
+        safe_name = re.sub(r'[^\w\-_\.]', '_', disk_name)
+        output_file = f"{safe_name}.json"
+        if output_dir:
+            output_file = os.path.join(output_dir, output_file)
+    else:
+        output_file = output
+        safe_name = os.path.basename(output_file).replace('.json', '')
+        safe_name = re.sub(r'[^\w\-_\.]', '_', safe_name)
+    return output_file, safe_name
+
+
+def _create_label(indexer: OptimizedTreeIndexer, safe_name: str, tree_data: Dict, output_file: str) -> str:
+    """Generera disk-label efter scanning (interaktivt - körs alltid i huvudtråden)"""
+    label_file = None
+    if not HAS_LABEL_SUPPORT:
+        print("⚠️ Label-generering ej tillgänglig - installera dependencies:")
+        print("   pip install qrcode[pil] pillow")
+        return None
+    try:
+        disk_name = safe_name.replace('_', ' ').title()
+        
+        print(f"🏷️ Försöker skapa label för: {disk_name} (URL: {safe_name})")
+        
+        label_file = indexer.generate_disk_label(disk_name, tree_data, output_file, safe_name)
+        
+        if label_file and os.path.exists(label_file):
+            print(f"✅ Label skapad framgångsrikt: {label_file}")
+        else:
+            print("❌ Label-fil kunde inte skapas")
+        
+        # Kundnivån som valdes för etiketten används även vid import
+        # (kund = den nivån, projekt = nivån under) om den inte angavs explicit
+        scan_info = tree_data['scan_info']
+        if indexer.customer_level is not None and not scan_info.get('client_level'):
+            scan_info['client_level'] = indexer.customer_level + 1
+            scan_info['project_level'] = scan_info.get('project_level') or indexer.customer_level + 2
+            print(f"🏢 Kundnivå {scan_info['client_level']}, projektnivå {scan_info['project_level']} sparas i JSON")
+            indexer._save_tree_data(tree_data, output_file)
+            
+    except Exception as e:
+        print(f"❌ Fel vid label-generering: {e}")
+        print(f"🔍 Fullständig felmeddelande: {type(e).__name__}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+    return label_file
+
+def _print_result(tree_data: Dict, output_file: str, label_file: str, no_label: bool):
+    print(f"\n📋 SLUTRESULTAT:")
+    print(f"   📁 Mappar: {tree_data['statistics']['total_directories']:,}")
+    print(f"   📄 Filer: {tree_data['statistics']['total_files']:,}")
+    print(f"   📏 Max djup: {tree_data['statistics']['max_depth']} nivåer")
+    print(f"   🗂️ Filtyper: {len(tree_data['statistics']['file_types'])}")
+    
+    print(f"\n✅ Färdigt! Optimerad för Cold Storage v2 import:")
+    print(f"   📄 JSON: {output_file}")
+    if label_file and os.path.exists(label_file):
+        print(f"   🏷️  Label: {label_file}")
+        print(f"   🏷️  Header: {label_file.replace('_label.jpg', '_label_header.jpg')}")
+    elif not no_label:
+        print(f"   ⚠️  Label kunde inte skapas")
+
+def run_multi_volume(args, extensions: List[str], exclude_patterns: List[str]) -> int:
+    """Scanna alla angivna volymer samtidigt, en output + checkpoint per volym"""
+    volumes = []
+    for path in args.path:
+        output_file, safe_name = _output_names(path, output_dir=args.output_dir)
+        volumes.append((path, output_file, safe_name))
+    
+    output_files = [output_file for _, output_file, _ in volumes]
+    if len(set(output_files)) != len(output_files):
+        print("❌ Fel: flera volymer får samma output-namn - byt namn eller scanna separat")
+        return 1
+    
+    scanner = MultiVolumeScanner(
+        max_depth=args.max_depth,
+        volumes_per_device=args.volumes_per_device,
+        io_workers=args.io_workers,
+        hash_mode=args.hash_mode,
+        hash_workers=args.hash_workers,
+        client_level=args.client_level,
+        project_level=args.project_level
+    )
+    
+    try:
+        results = scanner.scan(
+            [(path, output_file) for path, output_file, _ in volumes],
+            extensions,
+            exclude_patterns,
+            resume=not args.no_resume,
+            checkpoint_interval=args.checkpoint_interval
+        )
+    except KeyboardInterrupt:
+        print(f"\n⚠️ Scanning avbruten - checkpoints sparade för återupptagning")
+        print(f"💡 Kör samma kommando igen för att fortsätta")
+        return 1
+    except Exception as e:
+        print(f"❌ Fel: {e}")
+        return 1
+    
+    failed = 0
+    for path, output_file, safe_name in volumes:
+        tree_data = results.get(path)
+        print(f"\n💿 {path}")
+        if isinstance(tree_data, BaseException) or tree_data is None:
+            print(f"❌ Fel: {tree_data}")
+            failed += 1
+            continue
+        
+        # Labels skapas i tur och ordning efter scanningen (kundmapp-frågan är interaktiv)
+        label_file = None
+        if not args.no_label:
+            label_file = _create_label(
+                OptimizedTreeIndexer(max_depth=args.max_depth), safe_name, tree_data, output_file
+            )
+        _print_result(tree_data, output_file, label_file, args.no_label)
+    
+    print(f"\n✅ {len(volumes) - failed}/{len(volumes)} volymer klara")
+    print(f"💡 Ladda upp JSON-filerna via Cold Storage web-interface")
+    return 1 if failed else 0
 
 def main():
     parser = argparse.ArgumentParser(description='Optimized Tree Indexer för Cold Storage v2')
     
-    parser.add_argument('path', help='Sökväg att scanna')
-    parser.add_argument('--output', '-o', help='Output JSON-fil')
+    parser.add_argument('path', nargs='+', help='Sökväg(ar) att scanna - flera volymer scannas samtidigt')
+    parser.add_argument('--output', '-o', help='Output JSON-fil (bara med en volym)')
+    parser.add_argument('--output-dir', help='Katalog för output-filer (t.ex. vid flera volymer)')
     parser.add_argument('--extensions', nargs='*', help='Inkludera bara dessa filextensions (t.ex. .jpg .cr3)')
     parser.add_argument('--exclude', nargs='*', help='Exkludera patterns (regex)')
     parser.add_argument('--no-label', action='store_true', help='Hoppa över label-generering')
@@ -1154,18 +2082,24 @@ def main():
     parser.add_argument('--no-resume', action='store_true', help='Starta från början (ignorera checkpoint)')
     parser.add_argument('--checkpoint-interval', type=int, default=1000, help='Spara checkpoint var N kataloger (default: 1000)')
     parser.add_argument('--max-depth', type=int, default=8, help='Max djup att scanna (default: 8)')
+    parser.add_argument('--volumes-per-device', type=int, default=1,
+                        help='Antal volymer per fysisk disk som scannas samtidigt (default: 1)')
+    parser.add_argument('--io-workers', type=int, default=None,
+                        help='Fast antal samtidiga kataloglistningar (default: adaptivt efter disktyp)')
+    parser.add_argument('--hash', dest='hash_mode', nargs='?', const='full', choices=['full', 'sparse'],
+                        help='Beräkna BLAKE2b-checksumma per fil efter scanningen. '
+                             '"sparse" hashar bara början/mitten/slutet av stora videofiler')
+    parser.add_argument('--client-level', type=int, default=None,
+                        help='Sökvägsnivå för kundmappar (1 = första mappen under root), används vid import')
+    parser.add_argument('--project-level', type=int, default=None,
+                        help='Sökvägsnivå för projektmappar (t.ex. 2), används vid import')
+    parser.add_argument('--hash-workers', type=int, default=None,
+                        help='Antal parallella läsare vid hashning (default: efter disktyp)')
     
     args = parser.parse_args()
     
-    # Setup output files
-    if not args.output:
-        disk_name = os.path.basename(args.path.rstrip('/')) or 'UnknownDisk'
-        safe_name = re.sub(r'[^\w\-_\.]', '_', disk_name)
-        output_file = f"{safe_name}.json"
-    else:
-        output_file = args.output
-        safe_name = os.path.basename(output_file).replace('.json', '')
-        safe_name = re.sub(r'[^\w\-_\.]', '_', safe_name)
+    if len(args.path) > 1 and args.output:
+        parser.error("--output kan bara användas med en volym, använd --output-dir")
     
     extensions = None
     if args.foto_only:
@@ -1179,19 +2113,34 @@ def main():
     
     exclude_patterns = args.exclude or None
     
+    print(f"🚀 Optimized Tree Indexer för Cold Storage v2")
+    print(f"📏 Max djup: {args.max_depth} nivåer")
+    if not HAS_TQDM:
+        print("💡 Tips: Installera 'tqdm' för visuell progressbar: pip install tqdm")
+    if not HAS_LABEL_SUPPORT and not args.no_label:
+        print("💡 Tips: Installera 'qrcode[pil] pillow' för automatisk label-generering")
+    
+    # Flera volymer: scanna samtidigt
+    if len(args.path) > 1:
+        return run_multi_volume(args, extensions, exclude_patterns)
+    
+    # Setup output files
+    path = args.path[0]
+    output_file, safe_name = _output_names(path, args.output, args.output_dir)
+    
     # Skapa indexer med djup-begränsning
-    indexer = OptimizedTreeIndexer(max_depth=args.max_depth)
+    indexer = OptimizedTreeIndexer(
+        max_depth=args.max_depth,
+        io_workers=args.io_workers,
+        hash_mode=args.hash_mode,
+        hash_workers=args.hash_workers,
+        client_level=args.client_level,
+        project_level=args.project_level
+    )
     
     try:
-        print(f"🚀 Optimized Tree Indexer för Cold Storage v2")
-        print(f"📏 Max djup: {args.max_depth} nivåer")
-        if not HAS_TQDM:
-            print("💡 Tips: Installera 'tqdm' för visuell progressbar: pip install tqdm")
-        if not HAS_LABEL_SUPPORT and not args.no_label:
-            print("💡 Tips: Installera 'qrcode[pil] pillow' för automatisk label-generering")
-        
         tree_data = indexer.scan_directory_tree(
-            args.path,
+            path,
             output_file,
             extensions,
             exclude_patterns,
@@ -1202,43 +2151,11 @@ def main():
         # Generera disk-label efter scanning
         label_file = None
         if not args.no_label:
-            if not HAS_LABEL_SUPPORT:
-                print("⚠️ Label-generering ej tillgänglig - installera dependencies:")
-                print("   pip install qrcode[pil] pillow")
-            else:
-                try:
-                    disk_name = safe_name.replace('_', ' ').title()
-                    
-                    print(f"🏷️ Försöker skapa label för: {disk_name} (URL: {safe_name})")
-                    
-                    label_file = indexer.generate_disk_label(disk_name, tree_data, output_file, safe_name)
-                    
-                    if label_file and os.path.exists(label_file):
-                        print(f"✅ Label skapad framgångsrikt: {label_file}")
-                    else:
-                        print("❌ Label-fil kunde inte skapas")
-                        
-                except Exception as e:
-                    print(f"❌ Fel vid label-generering: {e}")
-                    print(f"🔍 Fullständig felmeddelande: {type(e).__name__}: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
+            label_file = _create_label(indexer, safe_name, tree_data, output_file)
         else:
             print("⏭️ Hoppar över label-generering (--no-label)")
         
-        print(f"\n📋 SLUTRESULTAT:")
-        print(f"   📁 Mappar: {tree_data['statistics']['total_directories']:,}")
-        print(f"   📄 Filer: {tree_data['statistics']['total_files']:,}")
-        print(f"   📏 Max djup: {tree_data['statistics']['max_depth']} nivåer")
-        print(f"   🗂️ Filtyper: {len(tree_data['statistics']['file_types'])}")
-        
-        print(f"\n✅ Färdigt! Optimerad för Cold Storage v2 import:")
-        print(f"   📄 JSON: {output_file}")
-        if label_file and os.path.exists(label_file):
-            print(f"   🏷️  Label: {label_file}")
-            print(f"   🏷️  Header: {label_file.replace('_label.jpg', '_label_header.jpg')}")
-        elif not args.no_label:
-            print(f"   ⚠️  Label kunde inte skapas")
+        _print_result(tree_data, output_file, label_file, args.no_label)
         print(f"💡 Ladda upp JSON-filen via Cold Storage web-interface")
         
     except KeyboardInterrupt:
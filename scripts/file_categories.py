@@ -0,0 +1 @@
+../backend/database/file_categories.py
\ No newline at end of file
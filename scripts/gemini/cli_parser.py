@@ -9,6 +9,23 @@ logger = logging.getLogger(__name__) # Lägg till denna rad
 
 from constants import DEFAULT_INCLUDE_EXTENSIONS
 
+def build_volume_names(path: str, output_file: str = None, output_dir: str = None) -> dict:
+    """Bestämmer output-fil och safe_name för en volym."""
+    if not output_file:
+        disk_name = os.path.basename(path.rstrip(os.sep)) or 'UnknownDisk'
+        logger.debug(f"Debug cli_parser: disk_name = '{disk_name}'")
+        safe_name = re.sub(r'[^\w\-_\.]', '_', disk_name)
+        logger.debug(f"Debug cli_parser: safe_name = '{safe_name}'")
+        output_file = f"{safe_name}.json"
+        if output_dir:
+            output_file = os.path.join(output_dir, output_file)
+    else:
+        # Om en output-fil angavs, generera safe_name från den
+        base_output_name = os.path.basename(output_file)
+        safe_name = re.sub(r'[^\w\-_\.]', '_', base_output_name.replace('.json', ''))
+
+    return {'path': path, 'output_file': output_file, 'disk_safe_name': safe_name}
+
 def parse_arguments():
     """Parsar kommandoradsargument."""
     parser = argparse.ArgumentParser(
@@ -16,10 +33,15 @@ def parse_arguments():
         formatter_class=argparse.RawTextHelpFormatter # För att bevara formatering i hjälptext
     )
     
-    parser.add_argument('path', 
-                        help='Sökväg till katalog som ska scannas.')
+    parser.add_argument('path', nargs='+',
+                        help='''Sökväg(ar) till katalog som ska scannas.
+Flera sökvägar (t.ex. flera monterade diskar) scannas samtidigt, en trådpool per fysisk disk.''')
     parser.add_argument('--output', '-o', 
-                        help='Output JSON-filens namn. Om inte angivet, genereras ett namn baserat på sökvägen.')
+                        help='Output JSON-filens namn. Om inte angivet, genereras ett namn baserat på sökvägen. Bara med en sökväg.')
+    parser.add_argument('--output-dir',
+                        help='Katalog där output-filerna skrivs (användbart vid flera sökvägar).')
+    parser.add_argument('--volumes-per-device', type=int, default=1,
+                        help='Antal volymer på samma fysiska disk som scannas samtidigt (default: 1).')
     parser.add_argument('--extensions', nargs='*', 
                         help='''Inkludera bara filer med dessa filändelser (t.ex. .jpg .cr3). 
 Filer utanför denna lista ignoreras.
@@ -51,6 +73,9 @@ Om denna flagga används, ignoreras --extensions om det också är angivet.
     args_parsed = parser.parse_args()
 
     logger.debug(f"Debug cli_parser: args.path = '{args_parsed.path}'")
+
+    if len(args_parsed.path) > 1 and args_parsed.output:
+        parser.error("--output kan bara användas med en sökväg, använd --output-dir för flera.")
     
     # Förbered extensions
     extensions = None
@@ -69,24 +94,19 @@ Om denna flagga används, ignoreras --extensions om det också är angivet.
         # Du kan ändra detta till att inkludera *alla* filer om du vill, genom att sätta extensions till None här.
         extensions = DEFAULT_INCLUDE_EXTENSIONS 
 
-    # Förbered output-filnamn
-    output_file = args_parsed.output
-    safe_name = ""
-    if not output_file:
-        disk_name = os.path.basename(args_parsed.path.rstrip(os.sep)) or 'UnknownDisk'
-        logger.debug(f"Debug cli_parser: disk_name = '{disk_name}'")
-        safe_name = re.sub(r'[^\w\-_\.]', '_', disk_name)
-        logger.debug(f"Debug cli_parser: safe_name = '{safe_name}'")
-        output_file = f"{safe_name}.json"
-    else:
-        # Om en output-fil angavs, generera safe_name från den
-        base_output_name = os.path.basename(output_file)
-        safe_name = re.sub(r'[^\w\-_\.]', '_', base_output_name.replace('.json', ''))
-    
+    # Förbered output-filnamn, ett per volym
+    volumes = [
+        build_volume_names(path, args_parsed.output, args_parsed.output_dir)
+        for path in args_parsed.path
+    ]
+    output_file, safe_name = volumes[0]['output_file'], volumes[0]['disk_safe_name']
+
     logger.debug(f"Debug cli_parser: final output_file generated = '{output_file}'")
 
     return {
-        'path': args_parsed.path,
+        'path': args_parsed.path[0],
+        'volumes': volumes,
+        'volumes_per_device': args_parsed.volumes_per_device,
         'output_file': output_file,
         'include_extensions': extensions,
         # FIX FÖR 'NoneType' error: Säkerställ att exclude_patterns alltid är en lista
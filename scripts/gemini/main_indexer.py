@@ -5,10 +5,11 @@ import json
 import pickle
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import re
 from collections import deque
 import logging
+import threading
 
 from file_types import determine_file_type
 from constants import DEFAULT_INCLUDE_EXTENSIONS, DEFAULT_EXCLUDE_PATTERNS, EXCLUDED_ROOT_FOLDERS
@@ -22,14 +23,20 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 class OptimizedTreeIndexer:
-    def __init__(self, max_depth: int, follow_symlinks: bool = False):
-        self.version = "2.5.1" # Version updated to reflect fix
+    def __init__(self, max_depth: int, follow_symlinks: bool = False,
+                 progress_desc: str = "Scanning...", progress_position: Optional[int] = None,
+                 stop_event: Optional[threading.Event] = None):
+        self.version = "2.6.0" # Multi-volume support
         self.checkpoint_file = None
         self.progress_bar = None
         self.max_depth = max_depth
         self.follow_symlinks = follow_symlinks
         self.tree_data = None
         self.start_time = None
+        # Used when several volumes are scanned concurrently (see multi_volume.py)
+        self.progress_desc = progress_desc
+        self.progress_position = progress_position
+        self.stop_event = stop_event
 
     def _should_exclude_directory(self, dir_path: str, root_path: str, exclude_regexes: List[re.Pattern]) -> bool:
         """Determines if a directory should be excluded from the scan."""
@@ -143,8 +150,10 @@ class OptimizedTreeIndexer:
         if HAS_TQDM:
             self.progress_bar = tqdm(
                 total=total_dirs,
-                desc="Scanning...",
+                desc=self.progress_desc,
                 unit=" dirs",
+                position=self.progress_position,
+                leave=True,
                 bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]"
             )
         
@@ -152,6 +161,10 @@ class OptimizedTreeIndexer:
         
         try:
             while q:
+                # Stop signal from a concurrent multi-volume run (Ctrl+C in the main thread)
+                if self.stop_event is not None and self.stop_event.is_set():
+                    raise KeyboardInterrupt
+
                 current_node, depth = q.popleft()
                 current_path = current_node['path']
 
@@ -0,0 +1,106 @@
+# multi_volume.py - Parallell scanning av flera volymer
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List
+
+from main_indexer import OptimizedTreeIndexer
+
+logger = logging.getLogger(__name__)
+
+
+def physical_device_key(path: str) -> str:
+    """
+    Identifiera den fysiska enhet en sökväg ligger på.
+
+    På Linux slås major:minor upp i /sys/dev/block så att två partitioner på
+    samma disk hamnar på samma nyckel (t.ex. 'sdb'). Annars (macOS, nätverks-
+    shares) används st_dev direkt.
+    """
+    st_dev = os.stat(path).st_dev
+    sys_path = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+    try:
+        device_dir = os.path.realpath(sys_path)
+        if not os.path.isdir(device_dir):
+            raise OSError(sys_path)
+        # Partition -> föräldern är själva disken
+        if os.path.exists(os.path.join(device_dir, 'partition')):
+            device_dir = os.path.dirname(device_dir)
+        return os.path.basename(device_dir)
+    except OSError:
+        return f"dev-{st_dev}"
+
+
+def scan_volumes(volumes: List[Dict], max_depth: int, follow_symlinks: bool,
+                 include_extensions: List[str], exclude_patterns: List[str],
+                 no_resume: bool, volumes_per_device: int = 1) -> Dict[str, object]:
+    """
+    Scanna flera volymer samtidigt.
+
+    Volymerna grupperas per fysisk enhet och varje enhet får en egen trådpool
+    med `volumes_per_device` arbetare, så att två partitioner på samma
+    snurrdisk inte tävlar om läshuvudet medan separata diskar jobbar parallellt.
+
+    Returnerar {sökväg: tree_data eller Exception}. Vid Ctrl+C stoppas alla
+    volymer, checkpoints sparas och KeyboardInterrupt kastas vidare.
+    """
+    by_device: Dict[str, List[Dict]] = {}
+    for volume in volumes:
+        if not os.path.exists(volume['path']):
+            raise FileNotFoundError(f"Root path does not exist: {volume['path']}")
+        by_device.setdefault(physical_device_key(volume['path']), []).append(volume)
+
+    logger.info(f"💽 {len(volumes)} volymer på {len(by_device)} enheter:")
+    for device, device_volumes in by_device.items():
+        logger.info(f"   {device}: {', '.join(v['path'] for v in device_volumes)}")
+
+    stop_event = threading.Event()
+    pools = {
+        device: ThreadPoolExecutor(max_workers=max(1, volumes_per_device),
+                                   thread_name_prefix=f"scan-{device}")
+        for device in by_device
+    }
+
+    futures = {}
+    position = 0
+    for device, device_volumes in by_device.items():
+        for volume in device_volumes:
+            indexer = OptimizedTreeIndexer(
+                max_depth=max_depth,
+                follow_symlinks=follow_symlinks,
+                progress_desc=volume['disk_safe_name'],
+                progress_position=position,
+                stop_event=stop_event
+            )
+            position += 1
+            future = pools[device].submit(
+                indexer.scan_directory_tree, volume['path'], volume['output_file'],
+                include_extensions, exclude_patterns, no_resume
+            )
+            futures[future] = volume['path']
+
+    results = {}
+    interrupted = False
+    try:
+        pending = set(futures)
+        while pending:
+            # Kort timeout så att Ctrl+C når huvudtråden
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except BaseException as e:
+                    results[futures[future]] = e
+    except KeyboardInterrupt:
+        interrupted = True
+        logger.warning("⚠️ Avbrutet - stoppar alla volymer och sparar checkpoints...")
+        stop_event.set()
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    if interrupted:
+        raise KeyboardInterrupt
+    return results
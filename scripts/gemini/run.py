@@ -7,10 +7,52 @@ import logging
 from main_indexer import OptimizedTreeIndexer, HAS_TQDM
 from label_generator import HAS_LABEL_SUPPORT, generate_disk_label, ask_for_customer_level
 from cli_parser import parse_arguments
+from multi_volume import scan_volumes
 from utils import setup_logging
 
 logger = logging.getLogger(__name__)
 
+def _finish_volume(tree_data: dict, volume: dict, no_label: bool):
+    """Skapa etiketter och skriv sammanfattning för en scannad volym."""
+    main_label_file = None
+    header_label_file = None
+
+    if not no_label and HAS_LABEL_SUPPORT:
+        # Calculate total_size_gb before the function call
+        total_size_bytes = tree_data['statistics']['total_size']
+        total_size_gb = total_size_bytes / (1024**3) # Convert bytes to GB
+        main_label_file, header_label_file = generate_disk_label(
+            disk_name=tree_data.get('tree', {}).get('name', os.path.basename(volume['path'])), # Safer way to get disk name
+            tree_data=tree_data, # <--- NYTT: Skicka hela tree_data hit
+            output_file=volume['output_file'],
+            disk_safe_name=volume['disk_safe_name'],
+        )
+    else:
+        logger.info("ℹ️ Etikettgenerering hoppades över.")
+
+    # *** KORRIGERING HÄR ***
+    # Använd .get() för att säkert hämta listan med fel/varningar.
+    # Om nyckeln 'errors_warnings' inte finns, returnerar .get() en tom lista [].
+    errors_and_warnings = tree_data.get('scan_info', {}).get('errors_warnings', [])
+    
+    if errors_and_warnings:
+        logger.warning(f"⚠️ Scan klar med {len(errors_and_warnings)} varningar/fel:")
+        for i, err in enumerate(errors_and_warnings[:5]):
+            logger.warning(f"   - {err}")
+        if len(errors_and_warnings) > 5:
+            logger.warning(f"   ... och {len(errors_and_warnings) - 5} fler varningar/fel.")
+
+    logger.info(f"\n✅ Färdigt! Optimerad för Cold Storage v2 import:")
+    logger.info(f"   📄 JSON-utdata: {volume['output_file']}")
+    if main_label_file and os.path.exists(main_label_file):
+        logger.info(f"   🏷️  Huvudetikett: {main_label_file}")
+    if header_label_file and os.path.exists(header_label_file):
+        logger.info(f"   🏷️  Headeretikett: {header_label_file}")
+    elif not no_label:
+        logger.warning(f"   ⚠️  Etiketter kunde inte skapas.")
+    logger.info(f"💡 Ladda upp JSON-filen via Cold Storage web-interface för full funktionalitet.")
+
+
 def main():
     args = parse_arguments()
     
@@ -26,9 +68,34 @@ def main():
     if not HAS_LABEL_SUPPORT and not args['no_label']:
         logger.warning("💡 Tips: Installera 'qrcode[pil] pillow' för automatisk label-generering.")
     
-    indexer = OptimizedTreeIndexer(max_depth=args['max_depth'], follow_symlinks=args['follow_symlinks'])
-    
     try:
+        if len(args['volumes']) > 1:
+            # Flera volymer: scanna parallellt (en trådpool per fysisk disk),
+            # etiketter skapas sekventiellt efteråt.
+            results = scan_volumes(
+                args['volumes'],
+                max_depth=args['max_depth'],
+                follow_symlinks=args['follow_symlinks'],
+                include_extensions=args['include_extensions'],
+                exclude_patterns=args['exclude_patterns'],
+                no_resume=args['no_resume'],
+                volumes_per_device=args['volumes_per_device']
+            )
+            failed = 0
+            for volume in args['volumes']:
+                result = results.get(volume['path'])
+                if isinstance(result, BaseException):
+                    failed += 1
+                    logger.error(f"❌ {volume['path']}: {result}")
+                    continue
+                _finish_volume(result, volume, args['no_label'])
+            if failed:
+                logger.error(f"⚠️ {failed} av {len(args['volumes'])} volymer misslyckades.")
+                sys.exit(1)
+            return
+
+        indexer = OptimizedTreeIndexer(max_depth=args['max_depth'], follow_symlinks=args['follow_symlinks'])
+
         # scan_directory_tree returnerar nu den inkapslade 'scan_info' strukturen
         tree_data = indexer.scan_directory_tree(
             args['path'],
@@ -37,44 +104,7 @@ def main():
             args['exclude_patterns'],
             args['no_resume']
         )
-        
-        main_label_file = None
-        header_label_file = None
-
-        if not args['no_label'] and HAS_LABEL_SUPPORT:
-            # Calculate total_size_gb before the function call
-            total_size_bytes = tree_data['statistics']['total_size']
-            total_size_gb = total_size_bytes / (1024**3) # Convert bytes to GB
-            main_label_file, header_label_file = generate_disk_label(
-                disk_name=tree_data.get('tree', {}).get('name', os.path.basename(args['path'])), # Safer way to get disk name
-                tree_data=tree_data, # <--- NYTT: Skicka hela tree_data hit
-                output_file=args['output_file'],
-                disk_safe_name=args['disk_safe_name'],
-            )
-        else:
-            logger.info("ℹ️ Etikettgenerering hoppades över.")
-
-        # *** KORRIGERING HÄR ***
-        # Använd .get() för att säkert hämta listan med fel/varningar.
-        # Om nyckeln 'errors_warnings' inte finns, returnerar .get() en tom lista [].
-        errors_and_warnings = tree_data.get('scan_info', {}).get('errors_warnings', [])
-        
-        if errors_and_warnings:
-            logger.warning(f"⚠️ Scan klar med {len(errors_and_warnings)} varningar/fel:")
-            for i, err in enumerate(errors_and_warnings[:5]):
-                logger.warning(f"   - {err}")
-            if len(errors_and_warnings) > 5:
-                logger.warning(f"   ... och {len(errors_and_warnings) - 5} fler varningar/fel.")
-
-        logger.info(f"\n✅ Färdigt! Optimerad för Cold Storage v2 import:")
-        logger.info(f"   📄 JSON-utdata: {args['output_file']}")
-        if main_label_file and os.path.exists(main_label_file):
-            logger.info(f"   🏷️  Huvudetikett: {main_label_file}")
-        if header_label_file and os.path.exists(header_label_file):
-            logger.info(f"   🏷️  Headeretikett: {header_label_file}")
-        elif not args['no_label']:
-            logger.warning(f"   ⚠️  Etiketter kunde inte skapas.")
-        logger.info(f"💡 Ladda upp JSON-filen via Cold Storage web-interface för full funktionalitet.")
+        _finish_volume(tree_data, args['volumes'][0], args['no_label'])
         
     except KeyboardInterrupt:
         logger.info(f"\n⚠️ Scanning avbruten av användaren - checkpoint sparad för återupptagning.")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testerna importerar indexerarna som när de körs som script från scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,140 @@
+"""
+Den adaptiva parallellitetsgränsen för kataloglistningar (AdaptiveIOController).
+
+Justeringen testas genom _adjust med konstruerade fönster (genomströmning,
+latens) så att varje AIMD-övergång och gränserna går att följa exakt.
+Fönsterlogiken i record() testas separat med min_window_seconds=0.
+"""
+
+import pytest
+
+from enhanced_tree_indexer import AdaptiveIOController
+
+
+def controller(kind: str = 'ssd', **kwargs) -> AdaptiveIOController:
+    kwargs.setdefault('min_window_seconds', 0.0)
+    return AdaptiveIOController(kind, **kwargs)
+
+
+def window(io: AdaptiveIOController, throughput: float, latency: float = 0.01):
+    """Ett avslutat fönster, som record() gör det"""
+    io._adjust(throughput, latency)
+    io._last_throughput = throughput
+
+
+# === Startpunkt ===
+
+@pytest.mark.parametrize("kind", list(AdaptiveIOController.PROFILES))
+def test_profile_sets_start_and_max(kind):
+    io = controller(kind)
+    start, max_limit = AdaptiveIOController.PROFILES[kind]
+    assert (io.limit, io.max_limit, io.adaptive) == (start, max_limit, True)
+
+
+def test_unknown_kind_falls_back_to_ssd():
+    io = controller('tape')
+    assert (io.limit, io.max_limit) == AdaptiveIOController.PROFILES['ssd']
+
+
+def test_fixed_limit_disables_adaptation():
+    io = controller(fixed=3, min_window=1)
+    for _ in range(50):
+        io.record(0.01, 100)
+    assert (io.limit, io.max_limit, io.adaptive, io.adjustments) == (3, 3, False, 0)
+
+
+# === AIMD-övergångar ===
+
+def test_first_window_probes_one_step_up():
+    io = controller('ssd')
+    window(io, 1000)
+    assert io.limit == 5
+
+
+def test_additive_increase_while_throughput_grows():
+    io = controller('ssd')
+    window(io, 1000)
+    window(io, 1100)
+    window(io, 1200)
+    assert io.limit == 7
+    assert io.adjustments == 3
+    assert io.peak_limit == 7
+
+
+def test_multiplicative_decrease_when_latency_spikes():
+    io = controller('ssd')
+    window(io, 1000, latency=0.01)      # 4 -> 5, baslinje 10 ms
+    window(io, 1100, latency=0.01)      # 5 -> 6
+    window(io, 1100, latency=0.05)      # platt genomströmning, 5x latens
+    assert io.limit == 3
+    assert io.peak_limit == 6
+
+
+def test_step_back_when_throughput_drops():
+    io = controller('ssd')
+    window(io, 1000)                    # 4 -> 5
+    window(io, 850, latency=0.02)       # -15 %, latensen under 3x baslinjen
+    assert io.limit == 4
+
+
+def test_plateau_probes_up_after_five_stable_windows():
+    io = controller('ssd')
+    window(io, 1000)                    # 4 -> 5
+    for _ in range(4):
+        window(io, 1000)
+    assert io.limit == 5
+    window(io, 1000)
+    assert io.limit == 6
+
+
+# === Gränser ===
+
+def test_limit_never_exceeds_profile_max():
+    io = controller('rotational')
+    throughput = 100.0
+    for _ in range(20):
+        throughput *= 1.5
+        window(io, throughput)
+    assert io.limit == io.max_limit == 4
+    assert io.peak_limit == 4
+
+
+def test_limit_never_drops_below_one():
+    io = controller('rotational')
+    window(io, 1000, latency=0.01)      # 1 -> 2
+    for _ in range(5):
+        window(io, 1000, latency=1.0)
+    assert io.limit == 1
+
+
+# === Fönster ===
+
+def test_record_waits_for_a_full_window():
+    io = controller('ssd', min_window=16)
+    # Fönstret är max(min_window, 2 * limit) listningar
+    for _ in range(15):
+        io.record(0.01, 10)
+    assert io.limit == 4 and io._last_throughput is None
+    io.record(0.01, 10)
+    assert io.limit == 5 and io._last_throughput is not None
+
+
+def test_record_respects_minimum_window_time():
+    io = AdaptiveIOController('ssd', min_window=1, min_window_seconds=3600)
+    for _ in range(100):
+        io.record(0.01, 10)
+    assert io.limit == 4 and io.adjustments == 0
+
+
+def test_summary_reports_limits():
+    io = controller('network', device='/dev/nfs0')
+    window(io, 1000)
+    assert io.summary() == {
+        'device': '/dev/nfs0',
+        'device_kind': 'network',
+        'adaptive': True,
+        'start_limit': 8,
+        'final_limit': 9,
+        'peak_limit': 9,
+        'adjustments': 1,
+    }
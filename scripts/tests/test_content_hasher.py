@@ -0,0 +1,168 @@
+"""
+Innehålls-hashningen i indexeraren (ContentHasher).
+
+Små filer i tmp_path med små block/spann så att alla läsvägar körs:
+fullständig hash, sparse-urvalet (början, mitten, slutet plus storleken)
+med eget prefix, och återupptagning från checkpoint.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+
+import pytest
+
+from enhanced_tree_indexer import ContentHasher, FileRecord
+
+SPAN = 64
+CHUNK = 16
+
+
+def blake(*parts: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=32)
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def write(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def record_for(path: str, file_type: str = 'video') -> FileRecord:
+    st = os.stat(path)
+    return FileRecord(os.path.basename(path), 'mov', st.st_size, file_type,
+                      st.st_mtime, st.st_ctime, st.st_ino)
+
+
+def hasher(**kwargs) -> ContentHasher:
+    kwargs.setdefault('chunk_size', CHUNK)
+    kwargs.setdefault('sparse_span', SPAN)
+    kwargs.setdefault('sparse_threshold', 4 * SPAN)
+    return ContentHasher(**kwargs)
+
+
+# === hash_file ===
+
+def test_full_hash_covers_whole_file(tmp_path):
+    data = os.urandom(1000)
+    checksum, bytes_read = hasher().hash_file(write(tmp_path, 'a.bin', data), len(data), sparse=False)
+    assert checksum == f"{ContentHasher.FULL_PREFIX}:{blake(data)}"
+    assert bytes_read == len(data)
+
+
+def test_sparse_hash_reads_start_middle_and_end(tmp_path):
+    data = os.urandom(1000)
+    size = len(data)
+    middle = size // 2 - SPAN // 2
+    checksum, bytes_read = hasher().hash_file(write(tmp_path, 'a.bin', data), size, sparse=True)
+
+    expected = blake(size.to_bytes(8, 'little'), data[:SPAN],
+                     data[middle:middle + SPAN], data[size - SPAN:])
+    assert checksum == f"{ContentHasher.SPARSE_PREFIX}:{expected}"
+    assert bytes_read == 3 * SPAN
+
+
+def test_sparse_hash_ignores_bytes_outside_the_samples(tmp_path):
+    data = bytearray(os.urandom(1000))
+    h = hasher()
+    before, _ = h.hash_file(write(tmp_path, 'a.bin', bytes(data)), len(data), sparse=True)
+
+    data[SPAN + 10] ^= 0xFF  # mellan början och mitten
+    outside, _ = h.hash_file(write(tmp_path, 'b.bin', bytes(data)), len(data), sparse=True)
+    data[len(data) // 2] ^= 0xFF  # inne i mitten-urvalet
+    inside, _ = h.hash_file(write(tmp_path, 'c.bin', bytes(data)), len(data), sparse=True)
+
+    assert outside == before
+    assert inside != before
+
+
+def test_sparse_and_full_checksums_never_match(tmp_path):
+    # Filen är mindre än spannet: samma bytes läses, men prefixet skiljer dem åt
+    data = os.urandom(SPAN // 2)
+    path = write(tmp_path, 'a.bin', data)
+    full, _ = hasher().hash_file(path, len(data), sparse=False)
+    sparse, _ = hasher().hash_file(path, len(data), sparse=True)
+    assert full.split(':')[0] == ContentHasher.FULL_PREFIX
+    assert sparse.split(':')[0] == ContentHasher.SPARSE_PREFIX
+    assert full.split(':')[1] != sparse.split(':')[1]
+
+
+@pytest.mark.parametrize("mode,file_type,size,expected", [
+    ('sparse', 'video', 4 * SPAN + 1, True),
+    ('sparse', 'video', 4 * SPAN, False),
+    ('sparse', 'image', 4 * SPAN + 1, False),
+    ('full', 'video', 4 * SPAN + 1, False),
+])
+def test_only_large_videos_are_sparse(mode, file_type, size, expected):
+    record = FileRecord('a.mov', 'mov', size, file_type, 0.0, 0.0)
+    assert hasher(mode=mode)._is_sparse(record) is expected
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ContentHasher(mode='md5')
+
+
+# === Checkpoint ===
+
+def test_run_resumes_unchanged_files_from_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'hash.checkpoint')
+    unchanged = write(tmp_path, 'unchanged.mov', b'x' * 100)
+    touched = write(tmp_path, 'touched.mov', b'y' * 100)
+    resized = write(tmp_path, 'resized.mov', b'z' * 100)
+    records = {name: record_for(path) for name, path in
+               (('unchanged.mov', unchanged), ('touched.mov', touched), ('resized.mov', resized))}
+
+    previous = hasher(checkpoint_file=checkpoint)
+    previous.done = {
+        'unchanged.mov': (records['unchanged.mov'].size, records['unchanged.mov'].mtime, 'from-checkpoint'),
+        'touched.mov': (records['touched.mov'].size, records['touched.mov'].mtime - 1, 'stale'),
+        'resized.mov': (records['resized.mov'].size + 1, records['resized.mov'].mtime, 'stale'),
+    }
+    previous._save_checkpoint()
+
+    paths = {'unchanged.mov': unchanged, 'touched.mov': touched, 'resized.mov': resized}
+    stats = hasher(checkpoint_file=checkpoint).run(
+        [(name, paths[name], record) for name, record in records.items()])
+
+    assert stats['resumed'] == 1
+    assert stats['hashed'] == 2
+    assert records['unchanged.mov'].checksum == 'from-checkpoint'
+    assert records['touched.mov'].checksum == f"{ContentHasher.FULL_PREFIX}:{blake(b'y' * 100)}"
+    assert records['resized.mov'].checksum == f"{ContentHasher.FULL_PREFIX}:{blake(b'z' * 100)}"
+    # Klar körning städar bort checkpointen
+    assert not os.path.exists(checkpoint)
+
+
+def test_checkpoint_from_other_mode_is_ignored(tmp_path):
+    checkpoint = str(tmp_path / 'hash.checkpoint')
+    path = write(tmp_path, 'a.mov', b'x' * 100)
+    record = record_for(path)
+
+    previous = hasher(mode='sparse', checkpoint_file=checkpoint)
+    previous.done = {'a.mov': (record.size, record.mtime, 'sparse-checksum')}
+    previous._save_checkpoint()
+
+    stats = hasher(mode='full', checkpoint_file=checkpoint).run([('a.mov', path, record)])
+    assert stats['resumed'] == 0
+    assert record.checksum == f"{ContentHasher.FULL_PREFIX}:{blake(b'x' * 100)}"
+
+
+def test_interrupted_run_keeps_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'hash.checkpoint')
+    path = write(tmp_path, 'a.mov', b'x' * 100)
+    stop = threading.Event()
+    stop.set()
+
+    h = hasher(checkpoint_file=checkpoint, stop_event=stop)
+    h.done = {'earlier.mov': (1, 1.0, 'kept')}
+    with pytest.raises(KeyboardInterrupt):
+        h.run([('a.mov', path, record_for(path))])
+
+    with open(checkpoint, 'rb') as f:
+        saved = pickle.load(f)
+    assert saved == {'mode': 'full', 'hashes': {'earlier.mov': (1, 1.0, 'kept')}}